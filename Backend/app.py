@@ -4,20 +4,64 @@ Haze Online - FastAPI Backend
 A simple e-commerce API with categories, products, and orders.
 """
 # Import necessary libraries
-from fastapi import FastAPI, Form, Depends, HTTPException
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List
+
+from fastapi import FastAPI, Body, Form, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import Numeric, cast, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 # Import our database models and connection
-from models import Product, Category, Order, OrderItem
-from database import get_db
+from models import ArchivedOrder, ArchivedOrderItem, Product, Category, Order, OrderItem
+from database import ReadSessionLocal, async_engine, close_db, get_async_db, get_read_db, init_db
+from schemas import (
+    CheckoutRequest, CategoryOut, ProductOut, OrderOut, OrderItemOut, OrderDetail,
+    BulkProductIn, BulkProductPatch, BulkResult, ChangeOut
+)
+from serialization import json_response, to_json
+from cache import catalog_cache, invalidate_categories, invalidate_products
+from conditional import is_not_modified, make_etag, validator_headers
+from search import search_statement
+from changes import read_changes, record_change
+from stock_stream import queue_stock_update, stock_broker, stream_events
+from bulk_products import BULK_MAX_ROWS, patch_products, upsert_products
+from archive import start_archiver
+from exports import EXPORT_FORMATS, order_items_statement, orders_statement, stream_rows
+from idempotency import IdempotentReplay, idempotent
+from logging_config import setup_logging
+from metrics import (
+    MetricsMiddleware, QueryTimingMiddleware, render_counters, render_value, request_metrics
+)
+
+# Logging (level and format come from LOG_LEVEL / LOG_FORMAT)
+setup_logging()
+logger = logging.getLogger("haze.api")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Check the schema and warm the connection pools before serving; close them on shutdown."""
+    await init_db()
+    archiver = start_archiver(async_engine)  # Only if ARCHIVE_INTERVAL_SECONDS is set
+    yield
+    if archiver is not None:
+        archiver.cancel()
+    await close_db()
+
 
 # Create the FastAPI app
 # 'title' and 'description' help document your API when you visit /docs
 app = FastAPI(
     title="Haze Online API",
     description="Backend API for Haze Online e-commerce store",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware for frontend communication
@@ -27,62 +71,361 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Next-Offset", "ETag", "Last-Modified", "Server-Timing", "Idempotent-Replayed"], # Let the browser read these headers
 )
 
+# Count and time SQL per request (Server-Timing header, N+1 warnings)
+app.add_middleware(QueryTimingMiddleware)
+
+# Time every request (added last so it wraps everything else)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(IntegrityError)
+async def integrity_error_handler(request, exc):
+    """
+    Turn constraint violations into a 409 instead of a 500.
+
+    Raised for duplicate names and, with foreign keys enforced, when
+    deleting a row that other rows still point at.
+    """
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "Request conflicts with existing data"},
+    )
+
+
+@app.exception_handler(IdempotentReplay)
+async def idempotent_replay_handler(request, exc):
+    """Answer a retried request with the response stored for its Idempotency-Key."""
+    return Response(
+        content=exc.body,
+        status_code=exc.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+# Default and maximum page sizes for list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+# HELPERS
+
+async def reserve_stock(db: AsyncSession, product_id: int, quantity: int) -> bool:
+    """
+    Atomically take `quantity` units of a product out of stock.
+
+    Runs a single conditional UPDATE so there is no window between
+    checking and writing the stock. Returns False if there was not
+    enough stock (no row was updated).
+    """
+    result = await db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock >= quantity)
+        .values(stock=Product.stock - quantity)
+        .returning(Product.stock, Product.price)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    if row is None:
+        return False
+    record_change(db, "product", product_id, "updated")
+    queue_stock_update(db, product_id, row.stock, row.price)
+    return True
+
+
+async def add_to_order_totals(db: AsyncSession, order_id: int, amount: float, items: int):
+    """
+    Add `amount` and `items` to an order's total_amount and item_count
+    (negative values to take items away).
+
+    A relative UPDATE in the caller's transaction, so concurrent writes to
+    the same order can't lose each other's changes.
+    """
+    await db.execute(
+        update(Order)
+        .where(Order.id == order_id)
+        .values(
+            total_amount=func.round(cast(Order.total_amount + amount, Numeric), 2),
+            item_count=Order.item_count + items,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def list_page(db: AsyncSession, model, limit: int, after, fields: str,
+                    *criteria, options=(), sort=None, descending=False):
+    """
+    Return one keyset-paginated page of `model` rows ordered by id.
+
+    Returns (rows, headers). Rows with id > `after` are returned, at most
+    `limit` of them. If more rows exist, headers carries the last id on the
+    page as X-Next-Cursor so the client can pass it back as `after`. When `fields` is given (a
+    comma-separated list of column names) only those columns are selected
+    in SQL and plain dicts are returned instead of ORM objects. `options`
+    are loader options (e.g. selectinload) applied to full-object queries.
+
+    With `sort` (a column) rows are ordered by (sort, id) instead, descending
+    if asked; `after` is then a (value, id) pair and the cursor is "value,id".
+    """
+    if fields:
+        columns = model.__table__.columns
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {unknown[0]}")
+        if "id" not in names:
+            names.insert(0, "id")  # Always needed for the cursor
+        if sort is not None and sort.name not in names:
+            names.append(sort.name)  # So is the sort column
+        query = select(*[columns[name] for name in names])
+    else:
+        query = select(model).options(*options)
+
+    query = query.where(*criteria)
+    keys = [model.id] if sort is None else [sort, model.id]
+    if after is not None:
+        if sort is None:
+            query = query.where(model.id > after)
+        elif descending:
+            query = query.where(tuple_(*keys) < tuple_(*after))
+        else:
+            query = query.where(tuple_(*keys) > tuple_(*after))
+    if descending:
+        keys = [key.desc() for key in keys]
+
+    # Fetch one extra row to know whether there is a next page
+    result = await db.execute(query.order_by(*keys).limit(limit + 1))
+    rows = result.all() if fields else result.scalars().all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers["X-Next-Cursor"] = (
+            str(last.id) if sort is None else f"{getattr(last, sort.name)},{last.id}"
+        )
+
+    if fields:
+        return [row._asdict() for row in rows], headers
+    return rows, headers
+
+
+async def get_one(db: AsyncSession, model, row_id: int, detail: str):
+    """Return (row, headers) for a single row by id, or raise a 404."""
+    row = await db.get(model, row_id)
+    if not row:
+        raise HTTPException(status_code=404, detail=detail)
+    return row, {}
+
+
+async def list_validators(db: AsyncSession, key, model, *criteria):
+    """
+    ETag for a list, from max(updated_at) and count(*).
+
+    One aggregate query, so checking freshness is much cheaper than loading
+    and serializing the list. Lists get no Last-Modified: deleting a row
+    doesn't move max(updated_at), so If-Modified-Since would answer 304
+    with a stale list. The count in the ETag does change.
+    """
+    result = await db.execute(
+        select(func.max(model.updated_at), func.count())
+        .select_from(model)
+        .where(*criteria)
+    )
+    last_modified, count = result.one()
+    return make_etag(*key, last_modified, count), None
+
+
+async def row_validators(db: AsyncSession, key, model, row_id: int):
+    """ETag and Last-Modified for a single row, or None if it doesn't exist."""
+    result = await db.execute(select(model.updated_at).where(model.id == row_id))
+    row = result.first()
+    if row is None:
+        return None
+    return make_etag(*key, row.updated_at), row.updated_at
+
+
+async def cached_json(request: Request, key, load, schema, validate=None,
+                      projected=False):
+    """
+    Serve a catalog response from the in-process cache.
+
+    On a miss `validate()` (if given) is awaited first; it returns
+    (etag, last_modified) or None. If the client already has the current
+    version a 304 is sent without loading anything. Otherwise `load()` is
+    awaited; it must return (data, headers). The data is encoded to JSON
+    bytes through `schema` once and stored together with the headers, so
+    hits skip both the database and the encoding.
+    """
+    entry = catalog_cache.get(key)
+    if entry is None:
+        version = catalog_cache.version
+        validators = await validate() if validate else None
+        if validators and is_not_modified(request, *validators):
+            return Response(status_code=304, headers=validator_headers(*validators))
+        data, headers = await load()
+        if validators:
+            headers = {**headers, **validator_headers(*validators)}
+        entry = (to_json(data, schema, projected), headers, validators)
+        catalog_cache.set(key, entry, version)
+
+    body, headers, validators = entry
+    if validators and is_not_modified(request, *validators):
+        return Response(status_code=304, headers=headers)
+    return json_response(body, headers)
+
+
+# Relationships that can be included in order responses with ?expand=
+ORDER_EXPANSIONS = {"items", "items.product"}
+
+
+def parse_expand(expand: str):
+    """Parse ?expand=items,items.product into a set, validating each name."""
+    names = {name.strip() for name in (expand or "").split(",") if name.strip()}
+    unknown = names - ORDER_EXPANSIONS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown expand: {sorted(unknown)[0]}")
+    if "items.product" in names:
+        names.add("items")
+    return names
+
+
+def order_load_options(expand, model=Order, item_model=OrderItem):
+    """
+    Eager-load options for the requested expansions.
+
+    selectinload fetches the items for every order in the page with one
+    extra query (and their products with one more), instead of one lazy
+    query per order and per item. Pass ArchivedOrder/ArchivedOrderItem for
+    archived orders.
+    """
+    if "items.product" in expand:
+        return [selectinload(model.order_items).selectinload(item_model.product)]
+    if "items" in expand:
+        return [selectinload(model.order_items)]
+    return []
+
+
+def serialize_order(order, expand):
+    """Order (live or archived) as a dict, with items, line totals and order total if expanded."""
+    data = {column.name: getattr(order, column.name) for column in order.__table__.columns}
+    if "items" not in expand:
+        return data
+
+    items = []
+    total = 0.0
+    for item in order.order_items:
+        line = {column.name: getattr(item, column.name) for column in item.__table__.columns}
+        line["line_total"] = round((item.quantity or 0) * item.price_at_purchase, 2)
+        if "items.product" in expand:
+            line["product"] = item.product
+        total += line["line_total"]
+        items.append(line)
+
+    data["items"] = items
+    data["total"] = round(total, 2)
+    return data
+
 
 # HOME ROUTE
 
 @app.get("/")
-def home():
+async def home():
     """Health check endpoint."""
-    print("Someone visited the home page!") # Debug print
+    logger.debug("Home page visited")
     return {"message": "Welcome to Haze Online API"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request latency, status and in-flight metrics in Prometheus text format."""
+    cache = catalog_cache.stats()
+    return (
+        request_metrics.render()
+        + render_counters(
+            "catalog_cache_lookups_total",
+            "Catalog cache lookups by result.",
+            {"hit": cache["hits"], "miss": cache["misses"]},
+        )
+        + render_value("stock_stream_subscribers", "Open /stream/stock connections.",
+                       "gauge", stock_broker.count)
+        + render_value("stock_stream_dropped_total", "Slow stream clients disconnected.",
+                       "counter", stock_broker.dropped)
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the catalog cache."""
+    return catalog_cache.stats()
+
+
 # CATEGORY ROUTES
 
 @app.post("/categories")
-def create_category(
+async def create_category(
     name: str = Form(...),
     description: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new category."""
-    print(f"Attempting to create category: {name}") # Debug print
-    
     new_category = Category(name=name, description=description)
     db.add(new_category)
-    db.commit()
-    db.refresh(new_category)
+    await db.flush()  # Assigns new_category.id for the change log
+    record_change(db, "category", new_category.id, "created")
+    await db.commit()
+    invalidate_categories()
     
-    print(f"Category created successfully with ID: {new_category.id}") # Debug print
+    logger.info("Category created", extra={"category_id": new_category.id, "category_name": name})
     return {"message": "Category created", "category_id": new_category.id}
 
 
-@app.get("/categories")
-def get_all_categories(db: Session = Depends(get_db)):
-    """Get all categories."""
-    return db.query(Category).all()
+@app.get("/categories", response_model=List[CategoryOut])
+async def get_all_categories(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: int = None,
+    fields: str = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get categories, one page at a time."""
+    key = ("categories", limit, after, fields)
+    return await cached_json(
+        request, key,
+        lambda: list_page(db, Category, limit, after, fields),
+        CategoryOut,
+        lambda: list_validators(db, key, Category),
+        projected=bool(fields),
+    )
 
 
-@app.get("/categories/{category_id}")
-def get_category(category_id: int, db: Session = Depends(get_db)):
+@app.get("/categories/{category_id}", response_model=CategoryOut)
+async def get_category(
+    category_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
     """Get a single category by ID."""
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    return category
+    key = ("category", category_id)
+    return await cached_json(
+        request, key,
+        lambda: get_one(db, Category, category_id, "Category not found"),
+        CategoryOut,
+        lambda: row_validators(db, key, Category, category_id),
+    )
 
 
 @app.patch("/categories/{category_id}")
-def update_category(
+async def update_category(
     category_id: int,
     name: str = Form(None),
     description: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an existing category."""
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
@@ -92,20 +435,24 @@ def update_category(
     if description is not None:
         category.description = description
     
-    db.commit()
-    db.refresh(category)
+    record_change(db, "category", category_id, "updated")
+    await db.commit()
+    invalidate_categories(category_id)
+    await db.refresh(category)
     return {"message": "Category updated", "category_id": category.id}
 
 
 @app.delete("/categories/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a category."""
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    db.delete(category)
-    db.commit()
+    await db.delete(category)
+    record_change(db, "category", category_id, "deleted")
+    await db.commit()
+    invalidate_categories(category_id)
     return {"message": "Category deleted"}
 
 
@@ -113,18 +460,18 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
 
 
 @app.post("/products")
-def create_product(
+async def create_product(
     name: str = Form(...),          # Product name from form data
     price: float = Form(...),       # Product price (must be a number)
     category_id: int = Form(...),   # Which category this product belongs to
     description: str = Form(None),  # Optional description
     stock: int = Form(0),           # Stock quantity (default is 0)
     image_url: str = Form(None),    # URL for the product image
-    db: Session = Depends(get_db)   # Database session dependency
+    db: AsyncSession = Depends(get_async_db)   # Database session dependency
 ):
     """Create a new product."""
     # Check if category exists
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
@@ -137,46 +484,148 @@ def create_product(
         image_url=image_url
     )
     db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
+    await db.flush()  # Assigns new_product.id for the change log
+    record_change(db, "product", new_product.id, "created")
+    queue_stock_update(db, new_product.id, new_product.stock, new_product.price)
+    await db.commit()
+    invalidate_products()
     
-    print(f"Product created: {name} (${price})") # Debug print
+    logger.info("Product created", extra={"product_id": new_product.id, "price": price})
     return {"message": "Product created", "product_id": new_product.id}
 
 
-@app.get("/products")
-def get_all_products(db: Session = Depends(get_db)):
-    """Get all products."""
-    return db.query(Product).all()
+@app.post("/products/bulk", response_model=BulkResult)
+async def bulk_create_products(
+    rows: List[BulkProductIn] = Body(..., min_length=1, max_length=BULK_MAX_ROWS),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create many products in one transaction; existing names are updated."""
+    body, changed_ids = await upsert_products(db, rows)
+    await db.commit()
+    invalidate_products(*changed_ids)
+
+    # "created" is a LogRecord attribute, so the counts get a rows_ prefix
+    logger.info("Bulk product upsert", extra={
+        "rows_created": body["created"], "rows_updated": body["updated"],
+        "rows_failed": body["failed"],
+    })
+    return body
+
+
+@app.patch("/products/bulk", response_model=BulkResult)
+async def bulk_update_products(
+    rows: List[BulkProductPatch] = Body(..., min_length=1, max_length=BULK_MAX_ROWS),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Update many products in one transaction, found by id or name.
 
+    Stock can be set (`stock`) or changed relative to its current value
+    (`stock_delta`). Rows that can't be applied are reported and skipped.
+    """
+    body, changed_ids = await patch_products(db, rows)
+    await db.commit()
+    invalidate_products(*changed_ids)
 
-@app.get("/products/{product_id}")
-def get_product(product_id: int, db: Session = Depends(get_db)):
+    logger.info("Bulk product update", extra={
+        "rows_updated": body["updated"], "rows_failed": body["failed"],
+    })
+    return body
+
+
+@app.get("/products", response_model=List[ProductOut])
+async def get_all_products(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: int = None,
+    fields: str = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get products, one page at a time."""
+    key = ("products", limit, after, fields)
+    return await cached_json(
+        request, key,
+        lambda: list_page(db, Product, limit, after, fields),
+        ProductOut,
+        lambda: list_validators(db, key, Product),
+        projected=bool(fields),
+    )
+
+
+@app.get("/products/search", response_model=List[ProductOut])
+async def search_products(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Full-text search over product names and descriptions, best match first."""
+    async def load():
+        statement = search_statement(db.bind.dialect.name, q, limit + 1, offset)
+        if statement is None:
+            return [], {}
+        rows = (await db.execute(statement)).scalars().all()
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Offset"] = str(offset + limit)
+        return rows, headers
+
+    return await cached_json(request, ("product_search", q, limit, offset), load, ProductOut)
+
+
+@app.get("/products/{product_id}", response_model=ProductOut)
+async def get_product(
+    product_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
     """Get a single product by ID."""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    key = ("product", product_id)
+    return await cached_json(
+        request, key,
+        lambda: get_one(db, Product, product_id, "Product not found"),
+        ProductOut,
+        lambda: row_validators(db, key, Product, product_id),
+    )
 
 
-@app.get("/categories/{category_id}/products")
-def get_products_by_category(category_id: int, db: Session = Depends(get_db)):
-    """Get all products in a specific category."""
-    return db.query(Product).filter(Product.category_id == category_id).all()
+@app.get("/categories/{category_id}/products", response_model=List[ProductOut])
+async def get_products_by_category(
+    category_id: int,
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: int = None,
+    fields: str = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get products in a specific category, one page at a time."""
+    key = ("category_products", category_id, limit, after, fields)
+    return await cached_json(
+        request, key,
+        lambda: list_page(
+            db, Product, limit, after, fields,
+            Product.category_id == category_id
+        ),
+        ProductOut,
+        lambda: list_validators(db, key, Product, Product.category_id == category_id),
+        projected=bool(fields),
+    )
 
 
 @app.patch("/products/{product_id}")
-def update_product(
+async def update_product(
     product_id: int,
     name: str = Form(None),
     price: float = Form(None),
     stock: int = Form(None),
     description: str = Form(None),
     image_url: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an existing product."""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -192,103 +641,350 @@ def update_product(
     if image_url is not None:
         product.image_url = image_url
     
-    db.commit()
-    db.refresh(product)
+    record_change(db, "product", product_id, "updated")
+    if stock is not None or price is not None:
+        queue_stock_update(db, product_id, product.stock, product.price)
+    await db.commit()
+    invalidate_products(product_id)
+    await db.refresh(product)
     return {"message": "Product updated", "product_id": product.id}
 
 
 @app.delete("/products/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db)):
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a product."""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    db.delete(product)
-    db.commit()
+    await db.delete(product)
+    record_change(db, "product", product_id, "deleted")
+    queue_stock_update(db, product_id, None, None, deleted=True)
+    await db.commit()
+    invalidate_products(product_id)
     return {"message": "Product deleted"}
 
 
+# CHANGE FEED
+
+@app.get("/changes", response_model=List[ChangeOut])
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Category and product changes after sequence number `since`, oldest first.
+
+    Pass the last `seq` you received as `since` on the next call.
+    """
+    changes, headers = await read_changes(db, since, limit)
+    return json_response(to_json(changes, ChangeOut), headers)
+
+
+# LIVE STOCK STREAM
+
+# Most product ids one stream can filter on
+MAX_STREAM_PRODUCT_IDS = 1000
+
+
+@app.get("/stream/stock")
+async def stream_stock(product_ids: str = None):
+    """
+    Server-Sent Events with each product's stock and price as changes commit.
+
+    Pass product_ids=1,2,3 to hear only about those products; their current
+    values are sent first. Without a filter, every product is streamed.
+    """
+    ids = None
+    if product_ids:
+        try:
+            ids = {int(value) for value in product_ids.split(",") if value.strip()}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="product_ids must be comma-separated integers")
+        if not ids:
+            raise HTTPException(status_code=400, detail="product_ids is empty")
+        if len(ids) > MAX_STREAM_PRODUCT_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_STREAM_PRODUCT_IDS} product_ids")
+
+    subscriber = stock_broker.subscribe(ids)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many open streams, try again later")
+
+    snapshot = []
+    if ids:
+        # Own short-lived session: the stream outlives the request's dependencies
+        try:
+            async with ReadSessionLocal() as db:
+                rows = await db.execute(
+                    select(Product.id, Product.stock, Product.price).where(Product.id.in_(ids))
+                )
+                snapshot = [
+                    {"product_id": row.id, "stock": row.stock, "price": row.price} for row in rows
+                ]
+        except Exception:
+            stock_broker.unsubscribe(subscriber)
+            raise
+
+    return StreamingResponse(
+        stream_events(subscriber, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # Don't let proxies buffer
+    )
+
+
 # ORDER ROUTES
 
 @app.post("/orders")
-def create_order(
+async def create_order(
     customer_name: str = Form(...),
-    db: Session = Depends(get_db)
+    idempotency_key: str = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Create a new order."""
-    new_order = Order(customer_name=customer_name)
+    """Create a new order. Send an Idempotency-Key header to make retries safe."""
+    async with idempotent(db, idempotency_key, "POST /orders",
+                          {"customer_name": customer_name}) as request:
+        new_order = Order(customer_name=customer_name)
+        db.add(new_order)
+        await db.flush()  # Assigns new_order.id without committing
+
+        body = {"message": "Order created", "order_id": new_order.id}
+        await request.commit(body)
+
+    logger.info("Order created", extra={"order_id": new_order.id})
+    return body
+
+
+@app.post("/orders/checkout")
+async def checkout(
+    payload: CheckoutRequest,
+    idempotency_key: str = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create an order with all of its items in a single transaction.
+
+    Send an Idempotency-Key header to make retries safe.
+    """
+    async with idempotent(db, idempotency_key, "POST /orders/checkout",
+                          payload.model_dump()) as request:
+        body = await place_order(db, payload)
+        await request.commit(body)
+
+    invalidate_products(*(line.product_id for line in payload.items))
+    logger.info("Order placed", extra={"order_id": body["order_id"], "item_count": body["item_count"]})
+    return body
+
+
+async def place_order(db: AsyncSession, payload: CheckoutRequest):
+    """Take stock and write the order and its items; the caller commits."""
+    # Merge repeated lines for the same product so stock is checked once
+    quantities = {}
+    for line in payload.items:
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+
+    # Load every referenced product in one query
+    result = await db.execute(select(Product).where(Product.id.in_(quantities)))
+    products = result.scalars().all()
+    products_by_id = {product.id: product for product in products}
+
+    missing = [pid for pid in quantities if pid not in products_by_id]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product not found: {missing[0]}")
+
+    # Reduce stock for every product, undoing everything if any line fails
+    for product_id, quantity in quantities.items():
+        if not await reserve_stock(db, product_id, quantity):
+            await db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Not enough stock available for product {product_id}"
+            )
+
+    new_order = Order(
+        customer_name=payload.customer_name,
+        total_amount=round(sum(
+            quantity * products_by_id[product_id].price for product_id, quantity in quantities.items()
+        ), 2),
+        item_count=len(quantities),
+    )
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
-    
-    print(f"New order placed by: {customer_name} (Order ID: {new_order.id})") # Debug print
-    return {"message": "Order created", "order_id": new_order.id}
+    await db.flush()  # Assigns new_order.id without committing
+
+    # Bulk insert all order items
+    await db.execute(
+        insert(OrderItem),
+        [
+            {
+                "order_id": new_order.id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price_at_purchase": products_by_id[product_id].price,
+            }
+            for product_id, quantity in quantities.items()
+        ],
+    )
+    return {
+        "message": "Order placed",
+        "order_id": new_order.id,
+        "item_count": len(quantities),
+    }
+
+
+# ?sort= values for GET /orders: (column, descending); None sorts by id
+ORDER_SORTS = {
+    "id": (None, False),
+    "total": (Order.total_amount, False),
+    "-total": (Order.total_amount, True),
+}
+
 
+def parse_order_cursor(after: str, sort_column):
+    """?after= as an id, or as a (total, id) pair when sorting by total."""
+    if after is None:
+        return None
+    try:
+        if sort_column is None:
+            return int(after)
+        total, order_id = after.rsplit(",", 1)
+        return float(total), int(order_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-@app.get("/orders")
-def get_all_orders(db: Session = Depends(get_db)):
-    """Get all orders."""
-    return db.query(Order).all()
 
+@app.get("/orders", response_model=List[OrderDetail], response_model_exclude_unset=True)
+async def get_all_orders(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str = None,
+    fields: str = None,
+    expand: str = None,
+    status: str = None,
+    start: datetime = None,
+    end: datetime = None,
+    sort: str = "id",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get orders, one page at a time. Use expand=items,items.product to include items.
+
+    Filter with status and a created_at range [start, end); sort=total or
+    sort=-total orders by total_amount. All of these are answered from
+    indexes on orders alone.
+    """
+    expand = parse_expand(expand)
+    if expand and fields:
+        raise HTTPException(status_code=400, detail="fields and expand cannot be combined")
+    if sort not in ORDER_SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort: {sort}")
+    sort_column, descending = ORDER_SORTS[sort]
+
+    criteria = []
+    if status is not None:
+        criteria.append(Order.status == status)
+    if start is not None:
+        criteria.append(Order.created_at >= start)
+    if end is not None:
+        criteria.append(Order.created_at < end)
+
+    rows, headers = await list_page(
+        db, Order, limit, parse_order_cursor(after, sort_column), fields, *criteria,
+        options=order_load_options(expand), sort=sort_column, descending=descending,
+    )
+    if expand:
+        rows = [serialize_order(order, expand) for order in rows]
+        return json_response(to_json(rows, OrderDetail, exclude_unset=True), headers)
+    return json_response(to_json(rows, OrderOut, projected=bool(fields)), headers)
+
+
+@app.get("/orders/{order_id}", response_model=OrderDetail, response_model_exclude_unset=True)
+async def get_order(
+    order_id: int,
+    expand: str = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get a single order by ID. Use expand=items,items.product to include items.
 
-@app.get("/orders/{order_id}")
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    """Get a single order by ID."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    Archived orders are found too; they carry an archived_at timestamp.
+    """
+    expand = parse_expand(expand)
+    result = await db.execute(
+        select(Order).where(Order.id == order_id).options(*order_load_options(expand))
+    )
+    order = result.scalars().first()
+    if not order:
+        result = await db.execute(
+            select(ArchivedOrder).where(ArchivedOrder.id == order_id)
+            .options(*order_load_options(expand, ArchivedOrder, ArchivedOrderItem))
+        )
+        order = result.scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return json_response(
+        to_json(serialize_order(order, expand), OrderDetail, exclude_unset=True)
+    )
 
 
 @app.patch("/orders/{order_id}")
-def update_order(
+async def update_order(
     order_id: int,
     status: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update order status."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     if status is not None:
         order.status = status
     
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    await db.refresh(order)
     return {"message": "Order updated", "order_id": order.id}
 
 
 @app.delete("/orders/{order_id}")
-def delete_order(order_id: int, db: Session = Depends(get_db)):
+async def delete_order(order_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete an order."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    db.delete(order)
-    db.commit()
+    await db.delete(order)
+    await db.commit()
     return {"message": "Order deleted"}
 
 
 # ORDER ITEM ROUTES
 
 @app.post("/order_items")
-def create_order_item(
+async def create_order_item(
     order_id: int = Form(...),
     product_id: int = Form(...),
     quantity: int = Form(...),
-    db: Session = Depends(get_db)
+    idempotency_key: str = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Add an item to an order."""
+    """Add an item to an order. Send an Idempotency-Key header to make retries safe."""
+    data = {"order_id": order_id, "product_id": product_id, "quantity": quantity}
+    async with idempotent(db, idempotency_key, "POST /order_items", data) as request:
+        body = await add_order_item(db, order_id, product_id, quantity)
+        await request.commit(body)
+
+    invalidate_products(product_id)
+    return body
+
+
+async def add_order_item(db: AsyncSession, order_id: int, product_id: int, quantity: int):
+    """Take stock and write one order item; the caller commits."""
     # Check if order exists
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Check if product exists
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -296,13 +992,11 @@ def create_order_item(
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than zero")
     
-    # Check stock availability
-    if product.stock < quantity:
+    # Check stock availability and reduce it in one atomic UPDATE
+    if not await reserve_stock(db, product_id, quantity):
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Not enough stock available")
     
-    # Reduce product stock
-    product.stock -= quantity
-    
     # Create the order item
     new_item = OrderItem(
         order_id=order_id,
@@ -311,30 +1005,70 @@ def create_order_item(
         price_at_purchase=product.price
     )
     db.add(new_item)
-    db.commit()
-    db.refresh(new_item)
+    await db.flush()  # Assigns new_item.id without committing
+    await add_to_order_totals(db, order_id, quantity * product.price, 1)
     return {"message": "Order item added", "order_item_id": new_item.id}
 
 
-@app.get("/order_items")
-def get_all_order_items(db: Session = Depends(get_db)):
-    """Get all order items."""
-    return db.query(OrderItem).all()
+@app.get("/order_items", response_model=List[OrderItemOut])
+async def get_all_order_items(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: int = None,
+    fields: str = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get order items, one page at a time."""
+    rows, headers = await list_page(db, OrderItem, limit, after, fields)
+    return json_response(to_json(rows, OrderItemOut, projected=bool(fields)), headers)
 
 # This allows you to run the server directly with 'python app.py'
 
 
 
-@app.get("/order_items/{item_id}")
-def get_order_item(item_id: int, db: Session = Depends(get_db)):
+@app.get("/order_items/{item_id}", response_model=OrderItemOut)
+async def get_order_item(item_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a single order item by ID."""
-    item = db.query(OrderItem).filter(OrderItem.id == item_id).first()
+    item = await db.get(OrderItem, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Order item not found")
     return item
 
+
+# EXPORT ROUTES
+
+def export_response(statement, name: str, export_format: str):
+    """Stream the rows of `statement` as a downloadable NDJSON or CSV file."""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    return StreamingResponse(
+        stream_rows(statement, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'},
+    )
+
+
+@app.get("/exports/orders")
+async def export_orders(
+    format: str = "ndjson",
+    start: datetime = None,
+    end: datetime = None
+):
+    """Stream all orders, optionally only those created in [start, end)."""
+    return export_response(orders_statement(start, end), "orders", format)
+
+
+@app.get("/exports/order_items")
+async def export_order_items(
+    format: str = "ndjson",
+    start: datetime = None,
+    end: datetime = None
+):
+    """Stream all order items, optionally only those whose order was created in [start, end)."""
+    return export_response(order_items_statement(start, end), "order_items", format)
+
+
 # This allows you to run the server directly with 'python app.py'
 if __name__ == "__main__":
     import uvicorn
-    print("Starting Haze Online Backend...")
+    logger.info("Starting Haze Online Backend...")
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Order archival: move old, finished orders out of the hot tables.
+
+Orders in a terminal status created more than ARCHIVE_AFTER_DAYS ago are
+copied, with their items, into archived_orders and archived_order_items and
+deleted from orders and order_items. Each batch of ARCHIVE_BATCH_SIZE
+orders is its own short transaction, with a pause in between, so other
+writers never wait long. Run it with `python cli.py archive` (e.g. from
+cron), or let the app do it every ARCHIVE_INTERVAL_SECONDS.
+
+Archived orders are read-only. GET /orders/{id} still finds them; lists,
+exports and analytics only cover live orders.
+
+Order and item ids are never reused (AUTOINCREMENT on SQLite, sequences
+elsewhere), so an archived id can't come back as a new live row.
+
+Settings are read from the environment:
+
+    ARCHIVE_AFTER_DAYS        Age (by created_at) at which orders are archived (default: 365)
+    ARCHIVE_STATUSES          Comma-separated terminal statuses (default: delivered,cancelled)
+    ARCHIVE_BATCH_SIZE        Orders moved per transaction (default: 500)
+    ARCHIVE_PAUSE_SECONDS     Pause between batches (default: 0.05)
+    ARCHIVE_INTERVAL_SECONDS  How often the app archives on its own; 0 (default) turns it off
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, delete, func, insert, literal, select
+
+from models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_STATUSES = [
+    status.strip() for status in os.getenv("ARCHIVE_STATUSES", "delivered,cancelled").split(",")
+    if status.strip()
+]
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_PAUSE_SECONDS = float(os.getenv("ARCHIVE_PAUSE_SECONDS", "0.05"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "0"))
+
+logger = logging.getLogger("haze.archive")
+
+
+def archive_cutoff(days=ARCHIVE_AFTER_DAYS):
+    """Orders created before this are old enough to archive."""
+    return datetime.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff, statuses):
+    """Condition for orders that can be archived (uses ix_orders_status_created_at)."""
+    return (Order.status.in_(statuses), Order.created_at < cutoff)
+
+
+def count_archivable(connection, cutoff, statuses=ARCHIVE_STATUSES):
+    """How many orders archive_batch() would eventually move."""
+    return connection.execute(
+        select(func.count()).select_from(Order).where(*archivable_orders(cutoff, statuses))
+    ).scalar()
+
+
+def archive_batch(connection, cutoff, statuses=ARCHIVE_STATUSES, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move up to `batch_size` archivable orders and their items to the archive.
+
+    Takes a sync Connection inside a transaction, and returns the number of
+    (orders, items) moved. The first statement is the INSERT, so on SQLite
+    the write lock is taken up front rather than upgraded from a read.
+    """
+    batch = select(Order.id).where(*archivable_orders(cutoff, statuses)).limit(batch_size)
+    order_columns = [column.name for column in Order.__table__.columns]
+    order_ids = connection.execute(
+        insert(ArchivedOrder)
+        .from_select(
+            order_columns + ["archived_at"],
+            select(*Order.__table__.columns, literal(datetime.now(), DateTime()))
+            .where(Order.id.in_(batch)),
+        )
+        .returning(ArchivedOrder.id)
+    ).scalars().all()
+    if not order_ids:
+        return 0, 0
+
+    items = connection.execute(
+        insert(ArchivedOrderItem).from_select(
+            [column.name for column in OrderItem.__table__.columns],
+            select(*OrderItem.__table__.columns).where(OrderItem.order_id.in_(order_ids)),
+        )
+    )
+    connection.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+    connection.execute(delete(Order).where(Order.id.in_(order_ids)))
+    return len(order_ids), items.rowcount
+
+
+def archive_orders(engine, cutoff, statuses=ARCHIVE_STATUSES, batch_size=ARCHIVE_BATCH_SIZE,
+                   pause=ARCHIVE_PAUSE_SECONDS):
+    """Archive everything that qualifies, one batch per transaction (cli.py)."""
+    orders = items = 0
+    while True:
+        with engine.begin() as connection:
+            moved_orders, moved_items = archive_batch(connection, cutoff, statuses, batch_size)
+        orders += moved_orders
+        items += moved_items
+        if moved_orders < batch_size:
+            return orders, items
+        time.sleep(pause)
+
+
+async def archive_orders_async(async_engine, cutoff, statuses=ARCHIVE_STATUSES,
+                               batch_size=ARCHIVE_BATCH_SIZE, pause=ARCHIVE_PAUSE_SECONDS):
+    """archive_orders() for the app's event loop."""
+    orders = items = 0
+    while True:
+        async with async_engine.begin() as connection:
+            moved_orders, moved_items = await connection.run_sync(
+                archive_batch, cutoff, statuses, batch_size
+            )
+        orders += moved_orders
+        items += moved_items
+        if moved_orders < batch_size:
+            return orders, items
+        await asyncio.sleep(pause)
+
+
+async def archive_periodically(async_engine, interval):
+    """Archive every `interval` seconds until cancelled; errors are logged and retried."""
+    while True:
+        try:
+            orders, items = await archive_orders_async(async_engine, archive_cutoff())
+            if orders:
+                logger.info("Archived orders", extra={"orders": orders, "order_items": items})
+        except Exception:
+            logger.exception("Archiving orders failed; retrying next interval")
+        await asyncio.sleep(interval)
+
+
+def start_archiver(async_engine):
+    """Start the in-app archive task if ARCHIVE_INTERVAL_SECONDS is set; returns it or None."""
+    if ARCHIVE_INTERVAL_SECONDS <= 0:
+        return None
+    return asyncio.create_task(archive_periodically(async_engine, ARCHIVE_INTERVAL_SECONDS))
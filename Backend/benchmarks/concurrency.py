@@ -0,0 +1,151 @@
+"""
+Requests/sec benchmark for the catalog and checkout endpoints.
+
+Starts the API under uvicorn against a fresh SQLite database in a temporary
+directory, seeds it over HTTP, then fires requests at increasing concurrency
+levels and prints requests/sec for each endpoint.
+
+To compare against another build (for example the old synchronous handlers),
+start that server yourself and point the benchmark at it with --base-url.
+
+Usage:
+    python benchmarks/concurrency.py
+    python benchmarks/concurrency.py --levels 1 64 256 --requests 2000
+    python benchmarks/concurrency.py --base-url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(port, workdir):
+    """Run the API in a subprocess with its database inside `workdir`."""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'haze.db')}")
+    # The app doesn't create tables; bring the database up to date first
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True,
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+
+
+async def wait_until_up(client, timeout=15):
+    """Poll the health check until the server answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start in time")
+
+
+async def seed(client, product_count):
+    """Create one category and `product_count` well-stocked products."""
+    res = await client.post("/categories", data={"name": f"bench-{time.time_ns()}"})
+    category_id = res.json()["category_id"]
+    product_ids = []
+    for i in range(product_count):
+        res = await client.post("/products", data={
+            "name": f"bench-product-{category_id}-{i}",
+            "price": 100 + i,
+            "category_id": category_id,
+            "stock": 1_000_000,
+        })
+        product_ids.append(res.json()["product_id"])
+    return category_id, product_ids
+
+
+async def run_level(client, make_request, total, concurrency):
+    """Send `total` requests with at most `concurrency` in flight; return req/s."""
+    remaining = iter(range(total))
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            res = await make_request(i)
+            if res.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return total / elapsed, errors
+
+
+async def benchmark(base_url, levels, total, product_count):
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_until_up(client)
+        category_id, product_ids = await seed(client, product_count)
+
+        scenarios = {
+            "GET /products": lambda i: client.get("/products", params={"limit": 50}),
+            "GET /products/{id}": lambda i: client.get(
+                f"/products/{product_ids[i % len(product_ids)]}"
+            ),
+            "GET /categories/{id}/products": lambda i: client.get(
+                f"/categories/{category_id}/products", params={"limit": 50}
+            ),
+            "POST /orders/checkout": lambda i: client.post("/orders/checkout", json={
+                "customer_name": "bench",
+                "items": [
+                    {"product_id": product_ids[(i + n) % len(product_ids)], "quantity": 1}
+                    for n in range(3)
+                ],
+            }),
+        }
+
+        print(f"{'Endpoint':<32}" + "".join(f"{f'c={c}':>12}" for c in levels))
+        print("-" * (32 + 12 * len(levels)))
+        for name, make_request in scenarios.items():
+            cells = []
+            for concurrency in levels:
+                rps, errors = await run_level(client, make_request, total, concurrency)
+                cells.append(f"{rps:>10.0f}{'*' if errors else ' '} ")
+            print(f"{name:<32}" + "".join(cells))
+        print("\nValues are requests/sec. * = some requests failed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--base-url", help="Benchmark an already running server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per level")
+    parser.add_argument("--products", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.base_url:
+        asyncio.run(benchmark(args.base_url, args.levels, args.requests, args.products))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_server(args.port, workdir)
+        try:
+            asyncio.run(benchmark(
+                f"http://127.0.0.1:{args.port}", args.levels, args.requests, args.products
+            ))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Synthetic data generator for benchmarks.
+
+Creates a fresh database and fills it with categories, products, orders and
+order items. The same --seed always produces the same data, so benchmark
+runs on different builds start from identical databases.
+
+Usage:
+    python benchmarks/datagen.py bench.db
+    python benchmarks/datagen.py bench.db --products 50000 --orders 200000 --seed 7
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import create_engine, func, insert, select, update
+
+from models import Category, Order, OrderItem, Product
+
+ORDER_STATUSES = ("pending", "shipped", "delivered", "cancelled")
+INSERT_BATCH_SIZE = 5000
+
+# Default volumes
+VOLUMES = {
+    "categories": 20,
+    "products": 2000,
+    "orders": 5000,
+    "items_per_order": 3,
+}
+
+
+def batches(rows, size=INSERT_BATCH_SIZE):
+    """Split a row iterator into lists of at most `size`."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_all(connection, model, rows):
+    """executemany INSERT of `rows` in batches."""
+    for batch in batches(rows):
+        connection.execute(insert(model), batch)
+
+
+def generate(path, categories, products, orders, items_per_order, seed=1):
+    """
+    Create the database at `path` (replacing any existing file) and fill it.
+
+    Returns a dict of row counts per table. Ids are assigned sequentially
+    from 1, so products are 1..products and categories 1..categories.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    url = f"sqlite:///{os.path.abspath(path)}"
+    # Migrated in a subprocess: importing database here would fix its
+    # DATABASE_URL before load.py points an in-process app at its own copy
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env=dict(os.environ, DATABASE_URL=url), check=True, capture_output=True,
+    )
+    engine = create_engine(url)
+
+    prices = [round(rng.uniform(5, 500), 2) for _ in range(products)]
+    item_count = 0
+
+    with engine.begin() as connection:
+        insert_all(connection, Category, (
+            {"id": i, "name": f"Category {i}", "description": f"Synthetic category {i}",
+             "created_at": now, "updated_at": now}
+            for i in range(1, categories + 1)
+        ))
+        insert_all(connection, Product, (
+            {"id": i, "name": f"Product {i}", "description": f"Synthetic product {i} " * 4,
+             "price": prices[i - 1], "stock": 1_000_000, "category_id": rng.randint(1, categories),
+             "image_url": f"https://example.com/products/{i}.png",
+             "created_at": now, "updated_at": now}
+            for i in range(1, products + 1)
+        ))
+        insert_all(connection, Order, (
+            {"id": i, "customer_name": f"Customer {rng.randint(1, max(orders // 4, 1))}",
+             "status": rng.choice(ORDER_STATUSES),
+             "created_at": now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))}
+            for i in range(1, orders + 1)
+        ))
+
+        def order_items():
+            nonlocal item_count
+            for order_id in range(1, orders + 1):
+                for product_id in rng.sample(range(1, products + 1), min(items_per_order, products)):
+                    item_count += 1
+                    yield {"order_id": order_id, "product_id": product_id,
+                           "quantity": rng.randint(1, 4), "price_at_purchase": prices[product_id - 1]}
+
+        insert_all(connection, OrderItem, order_items())
+
+        # Order totals, as the app keeps them when items are added
+        connection.execute(update(Order).values(
+            total_amount=select(func.coalesce(
+                func.round(func.sum(OrderItem.quantity * OrderItem.price_at_purchase), 2), 0
+            )).where(OrderItem.order_id == Order.id).scalar_subquery(),
+            item_count=select(func.count()).where(OrderItem.order_id == Order.id).scalar_subquery(),
+        ))
+
+    engine.dispose()
+    return {"categories": categories, "products": products, "orders": orders, "order_items": item_count}
+
+
+def add_volume_arguments(parser):
+    """--categories/--products/--orders/--items-per-order/--seed options."""
+    parser.add_argument("--categories", type=int, default=VOLUMES["categories"])
+    parser.add_argument("--products", type=int, default=VOLUMES["products"])
+    parser.add_argument("--orders", type=int, default=VOLUMES["orders"])
+    parser.add_argument("--items-per-order", type=int, default=VOLUMES["items_per_order"])
+    parser.add_argument("--seed", type=int, default=1, help="Same seed, same data")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark database")
+    parser.add_argument("path", help="SQLite file to create (replaced if it exists)")
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.path, args.categories, args.products, args.orders,
+                      args.items_per_order, args.seed)
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{count} {table}" for table, count in counts.items()) + f" in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
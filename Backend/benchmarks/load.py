@@ -0,0 +1,270 @@
+"""
+Reproducible load benchmark with latency percentiles and baseline checks.
+
+Generates a synthetic database (see datagen.py), then drives the API with a
+concurrent HTTP load generator, either in-process (httpx over ASGI, no
+network) or over uvicorn in a subprocess, or both. Every mode starts from
+its own copy of the same generated database.
+
+For each scenario it reports throughput and p50/p95/p99 latency as JSON.
+A request that gets a 4xx/5xx response counts as an error; the run exits
+with status 1 if any scenario had errors, since its numbers then time error
+responses rather than real work. With --baseline, the results are also
+compared against an earlier report and the run exits with status 1 if any
+latency grew, or any throughput fell, by more than --threshold.
+
+Usage:
+    python benchmarks/load.py --output results.json
+    python benchmarks/load.py --mode uvicorn --concurrency 64 --requests 2000
+    python benchmarks/load.py --baseline baseline.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from concurrency import start_server, wait_until_up
+from datagen import add_volume_arguments, generate
+
+MODES = ("inprocess", "uvicorn")
+
+# Latency metrics where higher is worse; throughput is the other way round
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def scenarios(client, counts, rng):
+    """Request factories per scenario name."""
+    products = counts["products"]
+    categories = counts["categories"]
+
+    def checkout(i):
+        lines = rng.sample(range(1, products + 1), min(rng.randint(1, 3), products))
+        return client.post("/orders/checkout", json={
+            "customer_name": f"bench-{i}",
+            "items": [{"product_id": product_id, "quantity": 1} for product_id in lines],
+        })
+
+    return {
+        "browse_products": lambda i: client.get(
+            "/products", params={"limit": 50, "after": rng.randint(0, max(products - 50, 0))}
+        ),
+        "list_categories": lambda i: client.get("/categories"),
+        "category_products": lambda i: client.get(
+            f"/categories/{rng.randint(1, categories)}/products", params={"limit": 50}
+        ),
+        "product_detail": lambda i: client.get(f"/products/{rng.randint(1, products)}"),
+        "checkout": checkout,
+    }
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(make_request, total, concurrency):
+    """Send `total` requests with at most `concurrency` in flight; return the stats dict."""
+    remaining = iter(range(total))
+    latencies = []
+    error_statuses = Counter()
+
+    async def worker():
+        for i in remaining:
+            started = time.perf_counter()
+            res = await make_request(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if res.status_code >= 400:
+                error_statuses[res.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": sum(error_statuses.values()),
+        "error_statuses": {str(status): count for status, count in sorted(error_statuses.items())},
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+async def run_all(client, counts, args):
+    """Warm up, then run every scenario; return {scenario: stats}."""
+    rng = random.Random(args.seed)
+    results = {}
+    for name, make_request in scenarios(client, counts, rng).items():
+        if args.only and name not in args.only:
+            continue
+        for i in range(args.warmup):
+            await make_request(i)
+        results[name] = await run_scenario(make_request, args.requests, args.concurrency)
+        print(f"  {name:<20}{results[name]['throughput_rps']:>10.0f} req/s"
+              f"   p50 {results[name]['p50_ms']:.1f}ms   p95 {results[name]['p95_ms']:.1f}ms"
+              f"   p99 {results[name]['p99_ms']:.1f}ms"
+              + (f"   {results[name]['errors']} errors" if results[name]["errors"] else ""),
+              file=sys.stderr)
+    return results
+
+
+def client_limits(concurrency):
+    return httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+
+async def run_inprocess(database_path, counts, args):
+    """Drive the app in this process over an ASGI transport (no sockets)."""
+    # The app reads its settings at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     limits=client_limits(args.concurrency), timeout=60) as client:
+            return await run_all(client, counts, args)
+
+
+async def run_uvicorn(workdir, counts, args):
+    """Drive a uvicorn subprocess whose database is `workdir`/haze.db."""
+    # Passed on to the subprocess (overrides an in-process run's setting)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'haze.db')}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    server = start_server(args.port, workdir)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}",
+                                     limits=client_limits(args.concurrency), timeout=60) as client:
+            await wait_until_up(client)
+            return await run_all(client, counts, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def failed_scenarios(results):
+    """List of messages for scenarios where any request got an error response."""
+    failures = []
+    for mode, scenario_results in results["modes"].items():
+        for name, current in scenario_results.items():
+            if current["errors"]:
+                failures.append(
+                    f"{mode}/{name}: {current['errors']} of {current['requests']} requests failed"
+                    f" (status {current['error_statuses']})"
+                )
+    return failures
+
+
+def compare(results, baseline, threshold):
+    """
+    List of regression messages for results that are worse than `baseline`
+    by more than `threshold` (a fraction, 0.1 = 10%).
+    """
+    regressions = []
+    for mode, scenario_results in results["modes"].items():
+        for name, current in scenario_results.items():
+            previous = baseline.get("modes", {}).get(mode, {}).get(name)
+            if previous is None:
+                continue
+            for metric in LATENCY_METRICS:
+                if previous[metric] > 0 and current[metric] > previous[metric] * (1 + threshold):
+                    regressions.append(
+                        f"{mode}/{name} {metric}: {previous[metric]} -> {current[metric]}"
+                    )
+            if current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+                regressions.append(
+                    f"{mode}/{name} throughput_rps: {previous['throughput_rps']} -> {current['throughput_rps']}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark with latency percentiles")
+    parser.add_argument("--mode", choices=MODES + ("both",), default="both")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed requests per scenario")
+    parser.add_argument("--only", nargs="+", help="Run only these scenarios")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed regression as a fraction (default: 0.10)")
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    modes = MODES if args.mode == "both" else (args.mode,)
+    report = {
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("output", "baseline", "port")},
+        "data": None,
+        "modes": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        template = os.path.join(workdir, "template.db")
+        print("Generating data...", file=sys.stderr)
+        counts = report["data"] = generate(template, args.categories, args.products, args.orders,
+                                           args.items_per_order, args.seed)
+
+        for mode in modes:
+            # Each mode gets a pristine copy, since checkout changes stock and orders
+            mode_dir = os.path.join(workdir, mode)
+            os.makedirs(mode_dir)
+            database_path = os.path.join(mode_dir, "haze.db")
+            shutil.copy(template, database_path)
+
+            print(f"{mode}:", file=sys.stderr)
+            if mode == "inprocess":
+                report["modes"][mode] = asyncio.run(run_inprocess(database_path, counts, args))
+            else:
+                report["modes"][mode] = asyncio.run(run_uvicorn(mode_dir, counts, args))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    failed = False
+    failures = failed_scenarios(report)
+    if failures:
+        print("\nScenarios with failed requests:", file=sys.stderr)
+        for line in failures:
+            print(f"  {line}", file=sys.stderr)
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            failed = True
+        else:
+            print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}",
+                  file=sys.stderr)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
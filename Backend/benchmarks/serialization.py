@@ -0,0 +1,89 @@
+"""
+Serialization cost per 10k rows: old path vs typed schemas.
+
+Builds in-memory Product and OrderItem objects (no database) and times:
+
+    jsonable_encoder  FastAPI's reflective encoder + json.dumps (the old path)
+    pydantic          Validate into the response schema + dump_json (Rust core)
+    orjson            orjson.dumps on plain column dicts (the ?fields= path)
+
+Usage:
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --rows 50000 --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from models import OrderItem, Product
+from schemas import OrderItemOut, ProductOut
+from serialization import to_json
+
+
+def make_products(count):
+    now = datetime.now()
+    return [
+        Product(
+            id=i, name=f"Product {i}", description="A product description " * 3,
+            price=100.0 + i, stock=i % 50, image_url=f"https://example.com/{i}.png",
+            created_at=now, updated_at=now, category_id=i % 20 + 1,
+        )
+        for i in range(count)
+    ]
+
+
+def make_order_items(count):
+    return [
+        OrderItem(id=i, order_id=i // 3 + 1, product_id=i % 500 + 1,
+                  quantity=i % 4 + 1, price_at_purchase=250.0)
+        for i in range(count)
+    ]
+
+
+def as_dicts(rows):
+    """What a ?fields= projection returns: plain column dicts."""
+    return [
+        {column.name: getattr(row, column.name) for column in row.__table__.columns}
+        for row in rows
+    ]
+
+
+def best_time(function, repeat):
+    """Fastest of `repeat` runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization micro-benchmark")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    per_10k = 10_000 / args.rows
+    print(f"{'Rows':<14}{'jsonable_encoder':>18}{'pydantic':>12}{'orjson':>10}   (ms per 10k rows)")
+    for name, rows, schema in [
+        ("products", make_products(args.rows), ProductOut),
+        ("order_items", make_order_items(args.rows), OrderItemOut),
+    ]:
+        dicts = as_dicts(rows)
+        old = best_time(lambda: json.dumps(jsonable_encoder(rows)).encode(), args.repeat)
+        typed = best_time(lambda: to_json(rows, schema), args.repeat)
+        projected = best_time(lambda: orjson.dumps(dicts), args.repeat)
+        print(f"{name:<14}{old * per_10k:>18.1f}{typed * per_10k:>12.1f}{projected * per_10k:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
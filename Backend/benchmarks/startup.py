@@ -0,0 +1,139 @@
+"""
+Cold start times for the API and the CLI.
+
+Each measurement runs in a fresh Python process against a migrated SQLite
+database in a temporary directory:
+
+    import app        Time to import the FastAPI app module
+    first response    From spawning uvicorn to the first 200 from GET /
+    workers ready     Until --workers workers have finished startup, with
+                      serve.py (or `uvicorn --workers` for a checkout
+                      that doesn't have it)
+    cli analytics     Wall time of `python cli.py analytics`
+
+Pass --backend-dir to time another checkout (e.g. an older commit in a
+git worktree) and compare.
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --backend-dir /tmp/old/Backend
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_APP = (
+    "import time; started = time.perf_counter(); import app; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def import_time(env, workdir):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_APP], env=env, cwd=workdir,
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def first_response_time(env, workdir, port):
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=workdir,
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return (time.perf_counter() - started) * 1000
+            except httpx.TransportError:
+                if server.poll() is not None:
+                    raise RuntimeError("Server exited during startup")
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def workers_ready_time(env, workdir, backend_dir, port, workers):
+    serve = os.path.join(backend_dir, "serve.py")
+    if os.path.exists(serve):
+        command = [sys.executable, serve, "--workers", str(workers), "--port", str(port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app:app",
+                   "--workers", str(workers), "--port", str(port)]
+
+    started = time.perf_counter()
+    server = subprocess.Popen(command, env=dict(env, LOG_LEVEL="INFO"), cwd=workdir,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        ready = 0
+        while ready < workers:
+            line = server.stdout.readline()
+            if not line:
+                raise RuntimeError("Server exited during startup")
+            if "Application startup complete" in line:
+                ready += 1
+        return (time.perf_counter() - started) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def cli_time(env, workdir, backend_dir):
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(backend_dir, "cli.py"), "analytics"],
+        env=env, cwd=workdir, check=True, capture_output=True,
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--backend-dir", default=BACKEND_DIR, help="Checkout to measure")
+    args = parser.parse_args()
+    backend_dir = os.path.abspath(args.backend_dir)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            PYTHONPATH=backend_dir,
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'haze.db')}",
+            LOG_LEVEL="WARNING",
+        )
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "upgrade", "head"],
+            env=env, cwd=backend_dir, check=True, capture_output=True,
+        )
+
+        results = {
+            "import app": [import_time(env, workdir) for _ in range(args.runs)],
+            "first response": [first_response_time(env, workdir, args.port) for _ in range(args.runs)],
+            f"{args.workers} workers ready": [
+                workers_ready_time(env, workdir, backend_dir, args.port, args.workers)
+                for _ in range(args.runs)
+            ],
+            "cli analytics": [cli_time(env, workdir, backend_dir) for _ in range(args.runs)],
+        }
+
+    print(f"{backend_dir}  ({args.runs} runs)")
+    print(f"{'':<18}{'median':>10}{'min':>10}")
+    for name, timings in results.items():
+        print(f"{name:<18}{statistics.median(timings):>8.0f}ms{min(timings):>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Set-based bulk writes for products, used by the inventory sync endpoints.
+
+Each request is validated against the database with one lookup query, then
+applied with one executemany INSERT ... ON CONFLICT DO UPDATE (POST) or one
+executemany UPDATE per group of rows that change the same columns (PATCH),
+all in a single transaction. Rows that can't be applied are reported
+individually and skipped; the rest go through.
+
+Stock deltas are guarded by `stock + delta >= 0` in the UPDATE itself. If a
+concurrent checkout makes the guard miss any row, the whole request is
+rolled back with a 409. That needs a matched-row count per row: drivers
+whose executemany rowcount can't be trusted (asyncpg) run those rows one
+UPDATE at a time.
+"""
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog_import import upsert_statement
+from changes import record_changes
+from models import Category, Product
+from stock_stream import queue_stock_update, stock_broker
+
+# Largest array accepted by the bulk endpoints
+BULK_MAX_ROWS = 10_000
+
+# Columns PATCH /products/bulk can set to an absolute value
+PATCH_COLUMNS = ("stock", "price", "description", "image_url")
+
+
+async def queue_stock_updates(db: AsyncSession, product_ids):
+    """Queue live stock updates for changed products, if anyone is listening."""
+    if not product_ids or not stock_broker.count:
+        return
+    rows = await db.execute(
+        select(Product.id, Product.stock, Product.price).where(Product.id.in_(product_ids))
+    )
+    for row in rows:
+        queue_stock_update(db, row.id, row.stock, row.price)
+
+
+def row_result(index, status, product_id=None, name=None, detail=None):
+    return {"index": index, "id": product_id, "name": name, "status": status, "detail": detail}
+
+
+def summarize(results):
+    """The response body: counts per status plus every row's result."""
+    results.sort(key=lambda result: result["index"])
+    return {
+        "created": sum(result["status"] == "created" for result in results),
+        "updated": sum(result["status"] == "updated" for result in results),
+        "failed": sum(result["status"] == "error" for result in results),
+        "results": results,
+    }
+
+
+async def upsert_products(db: AsyncSession, rows):
+    """
+    Create products, or update the ones whose name already exists.
+
+    Returns (response body, ids of changed products). Doesn't commit.
+    """
+    results = []
+    names = {row.name for row in rows}
+    category_ids = {row.category_id for row in rows}
+
+    known_categories = set((await db.execute(
+        select(Category.id).where(Category.id.in_(category_ids))
+    )).scalars())
+    existing = dict((await db.execute(
+        select(Product.name, Product.id).where(Product.name.in_(names))
+    )).all())
+
+    # A name given twice would make the result of the upsert ambiguous
+    last_index = {row.name: index for index, row in enumerate(rows)}
+
+    now = datetime.now()
+    values = []
+    for index, row in enumerate(rows):
+        if last_index[row.name] != index:
+            results.append(row_result(index, "error", name=row.name,
+                                      detail=f"name repeated at row {last_index[row.name]}"))
+        elif row.category_id not in known_categories:
+            results.append(row_result(index, "error", name=row.name,
+                                      detail=f"unknown category_id: {row.category_id}"))
+        else:
+            values.append({**row.model_dump(), "created_at": now, "updated_at": now})
+
+    if values:
+        statement = upsert_statement(
+            db.bind.dialect.name, Product,
+            ["price", "category_id", "description", "stock", "image_url", "updated_at"],
+        )
+        connection = await db.connection()
+        await connection.execute(statement, values)
+
+        # Look up the ids of the newly created rows in one query
+        created_names = [value["name"] for value in values if value["name"] not in existing]
+        created = dict((await db.execute(
+            select(Product.name, Product.id).where(Product.name.in_(created_names))
+        )).all()) if created_names else {}
+
+        for value in values:
+            name = value["name"]
+            status = "updated" if name in existing else "created"
+            results.append(row_result(
+                last_index[name], status, existing.get(name) or created.get(name), name
+            ))
+
+        await record_changes(db, "product", list(created.values()), "created")
+        await record_changes(db, "product", [
+            existing[value["name"]] for value in values if value["name"] in existing
+        ], "updated")
+
+    changed_ids = [result["id"] for result in results if result["status"] != "error"]
+    await queue_stock_updates(db, changed_ids)
+    return summarize(results), changed_ids
+
+
+async def patch_products(db: AsyncSession, rows):
+    """
+    Apply absolute or delta changes to existing products, found by id or name.
+
+    Returns (response body, ids of changed products). Doesn't commit.
+    """
+    results = []
+    ids = {row.id for row in rows if row.id is not None}
+    names = {row.name for row in rows if row.name is not None}
+
+    found = (await db.execute(
+        select(Product.id, Product.name, Product.stock).where(
+            or_(Product.id.in_(ids), Product.name.in_(names))
+        )
+    )).all()
+    by_id = {product.id: product for product in found}
+    by_name = {product.name: product for product in found}
+
+    # Rows grouped by which columns they set, so each group is one executemany
+    groups = {}
+    targeted = set()
+    for index, row in enumerate(rows):
+        product = by_id.get(row.id) if row.id is not None else by_name.get(row.name)
+        if product is None:
+            results.append(row_result(index, "error", row.id, row.name, "product not found"))
+            continue
+        if product.id in targeted:
+            results.append(row_result(index, "error", product.id, product.name,
+                                      "product appears more than once in this request"))
+            continue
+        if row.stock_delta is not None and (product.stock or 0) + row.stock_delta < 0:
+            results.append(row_result(index, "error", product.id, product.name,
+                                      f"stock would go below zero (stock is {product.stock or 0})"))
+            continue
+
+        changes = {column: getattr(row, column) for column in PATCH_COLUMNS
+                   if getattr(row, column) is not None}
+        if row.stock_delta is not None:
+            changes["stock_delta"] = row.stock_delta
+        targeted.add(product.id)
+        groups.setdefault(tuple(sorted(changes)), []).append(
+            {"b_id": product.id, **{f"b_{column}": value for column, value in changes.items()}}
+        )
+        results.append(row_result(index, "updated", product.id, product.name))
+
+    connection = await db.connection()
+    now = datetime.now()
+    for columns, params in groups.items():
+        statement = update(Product).where(Product.id == bindparam("b_id"))
+        values = {"updated_at": now}
+        for column in columns:
+            if column == "stock_delta":
+                # Applied relative to the current value; the guard keeps a
+                # concurrent checkout from pushing stock below zero
+                stock_after = func.coalesce(Product.stock, 0) + bindparam("b_stock_delta")
+                values["stock"] = stock_after
+                statement = statement.where(stock_after >= 0)
+            else:
+                values[column] = bindparam(f"b_{column}")
+        statement = statement.values(values)
+        if "stock_delta" not in columns:
+            await connection.execute(statement, params)
+            continue
+
+        if connection.dialect.supports_sane_multi_rowcount:
+            matched = (await connection.execute(statement, params)).rowcount
+        else:
+            matched = 0
+            for row_params in params:
+                matched += (await connection.execute(statement, row_params)).rowcount
+        if matched != len(params):
+            await db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail="Stock changed while the request was applied; nothing was saved, retry",
+            )
+
+    changed_ids = [result["id"] for result in results if result["status"] == "updated"]
+    await record_changes(db, "product", changed_ids, "updated")
+    await queue_stock_updates(db, changed_ids)
+    return summarize(results), changed_ids
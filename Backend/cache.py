@@ -0,0 +1,105 @@
+"""
+In-process cache for catalog reads.
+
+Settings are read from the environment:
+
+    CATALOG_CACHE_SIZE         Maximum number of cached responses (0 disables)
+    CATALOG_CACHE_TTL_SECONDS  How long a cached response stays fresh
+
+Each worker process has its own cache, so after a write other workers may
+serve the old value for up to the TTL.
+"""
+import os
+import time
+from collections import OrderedDict
+
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+
+
+class TTLCache:
+    """
+    A bounded LRU cache whose entries also expire after `ttl` seconds.
+
+    Keys are tuples whose first element is a namespace (e.g. "products"),
+    so a whole group of entries can be dropped with invalidate().
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.version = 0              # Bumped on every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]  # Expired
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)  # Mark as most recently used
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, version=None):
+        """
+        Store `value` under `key`.
+
+        Pass the `version` seen before loading the value; if anything was
+        invalidated while it was loading the value may be stale and is
+        not stored.
+        """
+        if self.max_entries <= 0 or (version is not None and version != self.version):
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)  # Drop the least recently used
+            self.evictions += 1
+
+    def delete(self, key):
+        """Drop a single entry."""
+        self.version += 1
+        self.entries.pop(key, None)
+
+    def invalidate(self, *namespaces):
+        """Drop every entry in the given namespaces."""
+        self.version += 1
+        for key in [key for key in self.entries if key[0] in namespaces]:
+            del self.entries[key]
+
+    def stats(self):
+        """Counters for sizing the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+        }
+
+
+# Shared cache for category and product reads
+catalog_cache = TTLCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL_SECONDS)
+
+
+def invalidate_categories(category_id=None):
+    """Drop cached category lists and, if given, one category."""
+    catalog_cache.invalidate("categories")
+    if category_id is not None:
+        catalog_cache.delete(("category", category_id))
+
+
+def invalidate_products(*product_ids):
+    """Drop cached product lists and the given products."""
+    catalog_cache.invalidate("products", "category_products", "product_search")
+    for product_id in product_ids:
+        catalog_cache.delete(("product", product_id))
@@ -0,0 +1,214 @@
+"""
+Bulk import of categories and products from CSV or JSON files.
+
+Rows are read lazily and written in batches: each batch is one executemany
+INSERT ... ON CONFLICT (name) DO UPDATE in its own transaction, so only one
+batch is in memory at a time and existing rows are updated in place.
+Each batch also writes its rows to the catalog change feed.
+
+Supported files:
+    .csv             Header row with column names
+    .ndjson, .jsonl  One JSON object per line (streamed)
+    .json            A JSON array of objects (read in full)
+
+Columns:
+    categories: name, description
+    products:   name, price, category (name) or category_id,
+                description, stock, image_url
+"""
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from changes import change_rows
+from models import CatalogChange, Category, Product
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+class RowError(ValueError):
+    """A row that can't be imported; the message says why."""
+
+
+def read_rows(path):
+    """
+    Yield (line_number, row dict) from a CSV or JSON file.
+
+    A line of NDJSON that isn't valid JSON is yielded as a RowError
+    instead of a dict, so one bad line doesn't stop the import.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as file:
+        if extension == ".csv":
+            # Line 1 is the header
+            for number, row in enumerate(csv.DictReader(file), start=2):
+                yield number, row
+        elif extension in (".ndjson", ".jsonl"):
+            for number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError:
+                        yield number, RowError("invalid JSON")
+        elif extension == ".json":
+            for number, row in enumerate(json.load(file), start=1):
+                yield number, row
+        else:
+            raise ValueError(f"Unsupported file type: {extension} (use .csv, .ndjson or .json)")
+
+
+def text_value(row, column):
+    """A stripped string column, or None if missing/blank."""
+    value = row.get(column)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def number_value(row, column, convert, default=None):
+    """A numeric column, converted with `convert`, or `default` if blank."""
+    value = text_value(row, column)
+    if value is None:
+        return default
+    try:
+        number = convert(value)
+    except ValueError:
+        raise RowError(f"{column} is not a valid number: {value!r}")
+    if number < 0:
+        raise RowError(f"{column} cannot be negative")
+    return number
+
+
+def category_values(row, now):
+    name = text_value(row, "name")
+    if name is None:
+        raise RowError("name is required")
+    return {
+        "name": name,
+        "description": text_value(row, "description"),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def product_values(row, now, category_ids, known_category_ids):
+    name = text_value(row, "name")
+    if name is None:
+        raise RowError("name is required")
+    price = number_value(row, "price", float)
+    if price is None:
+        raise RowError("price is required")
+
+    # Accept a category name (resolved from the map) or a numeric id
+    category_name = text_value(row, "category")
+    if category_name is not None:
+        if category_name not in category_ids:
+            raise RowError(f"unknown category: {category_name!r}")
+        category_id = category_ids[category_name]
+    else:
+        category_id = number_value(row, "category_id", int)
+        if category_id is None:
+            raise RowError("category or category_id is required")
+        if category_id not in known_category_ids:
+            raise RowError(f"unknown category_id: {category_id}")
+
+    return {
+        "name": name,
+        "price": price,
+        "category_id": category_id,
+        "description": text_value(row, "description"),
+        "stock": number_value(row, "stock", int, default=0),
+        "image_url": text_value(row, "image_url"),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def upsert_statement(dialect_name, model, update_columns):
+    """INSERT ... ON CONFLICT (name) DO UPDATE for SQLite or PostgreSQL."""
+    dialects = {"sqlite": sqlite, "postgresql": postgresql}
+    if dialect_name not in dialects:
+        raise ValueError(f"Bulk import is not supported on {dialect_name}")
+    statement = dialects[dialect_name].insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={column: statement.excluded[column] for column in update_columns},
+    )
+
+
+def import_file(db, kind, path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import `kind` ("categories" or "products") from `path`.
+
+    Returns (imported_count, rejected, seconds) where rejected is a list of
+    (line_number, reason), in line order. When a name appears twice in one
+    batch the later row wins and the earlier one is rejected.
+    """
+    if kind == "categories":
+        model, entity = Category, "category"
+        update_columns = ["description", "updated_at"]
+        category_ids = known_category_ids = None
+    else:
+        model, entity = Product, "product"
+        update_columns = ["price", "category_id", "description", "stock", "image_url", "updated_at"]
+        # Resolve every category name to its id up front, in one query
+        category_ids = dict(db.execute(select(Category.name, Category.id)).all())
+        known_category_ids = set(category_ids.values())
+
+    statement = upsert_statement(db.bind.dialect.name, model, update_columns)
+    imported = 0
+    rejected = []
+    batch = {}
+    batch_lines = {}  # name -> line number of the row in the batch
+    started = time.perf_counter()
+
+    def flush():
+        nonlocal imported
+        if batch:
+            names = model.name.in_(batch)
+            existing = dict(db.execute(select(model.name, model.id).where(names)).all())
+            db.execute(statement, list(batch.values()))
+
+            # Record every imported row in the change feed, in the same transaction
+            ids = dict(db.execute(select(model.name, model.id).where(names)).all())
+            created = [ids[name] for name in batch if name not in existing]
+            db.execute(insert(CatalogChange), change_rows(entity, created, "created")
+                       + change_rows(entity, list(existing.values()), "updated"))
+            db.commit()
+            imported += len(batch)
+            batch.clear()
+            batch_lines.clear()
+
+    now = datetime.now()
+    for number, row in read_rows(path):
+        try:
+            if isinstance(row, RowError):
+                raise row
+            if not isinstance(row, dict):
+                raise RowError("row is not an object")
+            if kind == "categories":
+                values = category_values(row, now)
+            else:
+                values = product_values(row, now, category_ids, known_category_ids)
+        except RowError as error:
+            rejected.append((number, str(error)))
+            continue
+
+        # Keyed on name so a repeated name in one batch keeps the last row
+        name = values["name"]
+        if name in batch:
+            rejected.append((batch_lines[name], f"name repeated at line {number}"))
+        batch[name] = values
+        batch_lines[name] = number
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    rejected.sort()
+    return imported, rejected, time.perf_counter() - started
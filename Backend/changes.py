@@ -0,0 +1,90 @@
+"""
+Catalog change feed.
+
+Every write to a category or product adds a row to catalog_changes in the
+same transaction, so a change is in the feed exactly when it is committed.
+Clients keep a local copy of the catalog and poll GET /changes?since=<seq>
+for what changed after the last sequence number they saw, instead of
+re-reading every product.
+
+Each change carries the row's current state (or null once it is deleted),
+so applying the changes in order brings a copy up to date.
+
+On SQLite, writers are serialized, so sequence numbers become visible in
+order. On PostgreSQL a transaction can commit after a later one; clients
+that need every change there should re-read a small window behind their
+cursor.
+"""
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import CatalogChange, Category, Product
+from schemas import CategoryOut, ChangeOut, ProductOut
+
+ENTITIES = {
+    "category": (Category, CategoryOut),
+    "product": (Product, ProductOut),
+}
+
+
+def record_change(db, entity, entity_id, action):
+    """Add a change to the session; it is written when the session commits."""
+    db.add(CatalogChange(entity=entity, entity_id=entity_id, action=action,
+                         changed_at=datetime.now()))
+
+
+def change_rows(entity, entity_ids, action):
+    """Parameter dicts for an executemany INSERT of one change per id."""
+    now = datetime.now()
+    return [
+        {"entity": entity, "entity_id": entity_id, "action": action, "changed_at": now}
+        for entity_id in entity_ids
+    ]
+
+
+async def record_changes(db: AsyncSession, entity, entity_ids, action):
+    """Write one change per id with a single executemany INSERT (bulk writes)."""
+    if entity_ids:
+        await db.execute(insert(CatalogChange), change_rows(entity, entity_ids, action))
+
+
+async def read_changes(db: AsyncSession, since, limit):
+    """
+    Up to `limit` changes after sequence number `since`, oldest first, each
+    with the current state of its row.
+
+    Returns (changes, headers); X-Next-Cursor is set when there may be more.
+    """
+    changes = (await db.execute(
+        select(CatalogChange)
+        .where(CatalogChange.id > since)
+        .order_by(CatalogChange.id)
+        .limit(limit + 1)
+    )).scalars().all()
+
+    headers = {}
+    if len(changes) > limit:
+        changes = changes[:limit]
+        headers["X-Next-Cursor"] = str(changes[-1].id)
+
+    # Current rows for every changed entity, one query per entity type
+    current = {}
+    for entity, (model, schema) in ENTITIES.items():
+        ids = {change.entity_id for change in changes if change.entity == entity}
+        if ids:
+            rows = (await db.execute(select(model).where(model.id.in_(ids)))).scalars()
+            current.update({(entity, row.id): schema.model_validate(row) for row in rows})
+
+    return [
+        ChangeOut(
+            seq=change.id,
+            entity=change.entity,
+            id=change.entity_id,
+            action=change.action,
+            changed_at=change.changed_at,
+            data=current.get((change.entity, change.entity_id)),
+        )
+        for change in changes
+    ], headers
@@ -6,7 +6,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
+from database import SessionLocal, check_schema, engine
 from models import Base, Product, Category, Order, OrderItem
 
 # Utils
@@ -16,14 +16,99 @@ import os
 # fix imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import time
+
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
+from changes import record_change
+from database import SessionLocal, check_schema, engine
 from models import Base, Product, Category, Order, OrderItem
 
 # Start the database session
 def get_db_session():
     return SessionLocal()
 
+
+# Analytics
+# Every report is a single aggregate query run in the database, so it
+# stays fast and light on memory however big the catalog gets.
+
+LOW_STOCK_THRESHOLD = 5
+REPORT_LIMIT = 10
+
+
+def run_timed(db, statement):
+    """Run a query and return (rows, milliseconds taken)."""
+    started = time.perf_counter()
+    rows = db.execute(statement).all()
+    return rows, (time.perf_counter() - started) * 1000
+
+
+def print_report(title, header, rows, elapsed_ms):
+    print(f"\n--- {title} ({elapsed_ms:.1f} ms) ---")
+    print(header)
+    print("--------------------------------------------------")
+    if len(rows) == 0:
+        print("(none)")
+
+
+def show_analytics(db, low_stock_threshold=LOW_STOCK_THRESHOLD):
+    print("Store Analytics")
+
+    # Totals
+    rows, ms = run_timed(db, select(
+        func.count(Product.id),
+        func.coalesce(func.sum(Product.price * Product.stock), 0),
+    ))
+    product_count, total_value = rows[0]
+    print(f"\n--- Totals ({ms:.1f} ms) ---")
+    print(f"Total Products: {product_count}")
+    print(f"Inventory Value: KSh {total_value:,.2f}")
+
+    # Inventory value per category
+    rows, ms = run_timed(db, select(
+        Category.name,
+        func.count(Product.id),
+        func.coalesce(func.sum(Product.stock), 0),
+        func.coalesce(func.sum(Product.price * Product.stock), 0),
+    ).outerjoin(Product, Product.category_id == Category.id)
+     .group_by(Category.id, Category.name)
+     .order_by(func.coalesce(func.sum(Product.price * Product.stock), 0).desc()))
+    print_report("Inventory by Category", "Category                       Products   Stock      Value", rows, ms)
+    for name, count, stock, value in rows:
+        print(f"{name:<30} {count:<10} {stock:<10} KSh {value:,.2f}")
+
+    # Low stock
+    rows, ms = run_timed(db, select(Product.id, Product.name, Product.stock)
+                         .where(Product.stock <= low_stock_threshold)
+                         .order_by(Product.stock, Product.id)
+                         .limit(REPORT_LIMIT * 2))
+    print_report(f"Low Stock (<= {low_stock_threshold})", "ID    Name                           Stock", rows, ms)
+    for product_id, name, stock in rows:
+        print(f"{product_id:<5} {name:<30} {stock}")
+
+    # Top sellers by quantity, with revenue at the price actually paid
+    quantity_sold = func.sum(OrderItem.quantity)
+    rows, ms = run_timed(db, select(
+        Product.name,
+        quantity_sold,
+        func.sum(OrderItem.quantity * OrderItem.price_at_purchase),
+    ).join(Product, Product.id == OrderItem.product_id)
+     .group_by(OrderItem.product_id, Product.name)
+     .order_by(quantity_sold.desc())
+     .limit(REPORT_LIMIT))
+    print_report("Top Sellers", "Name                           Sold       Revenue", rows, ms)
+    for name, sold, revenue in rows:
+        print(f"{name:<30} {sold:<10} KSh {revenue:,.2f}")
+
+    # Orders by status
+    rows, ms = run_timed(db, select(Order.status, func.count(Order.id))
+                         .group_by(Order.status)
+                         .order_by(func.count(Order.id).desc()))
+    print_report("Orders by Status", "Status                         Orders", rows, ms)
+    for status, count in rows:
+        print(f"{str(status):<30} {count}")
+
 # Main function to run the app
 def main():
     db = get_db_session()
@@ -86,11 +171,14 @@ def main():
                     stock=stock,
                     description=description
                 )
-                # Add to database
+                # Add to database, with its change feed entry
                 db.add(new_product)
+                db.flush()  # Assigns new_product.id
+                record_change(db, "product", new_product.id, "created")
                 db.commit()
                 print("Success! Product added.")
             except:
+                db.rollback()
                 print("Something went wrong. Please check your inputs.")
 
         elif choice == '4':
@@ -101,22 +189,13 @@ def main():
             
             new_cat = Category(name=name, description=description)
             db.add(new_cat)
+            db.flush()  # Assigns new_cat.id
+            record_change(db, "category", new_cat.id, "created")
             db.commit()
             print("Success! Category created.")
 
         elif choice == '5':
-            # Simple stats
-            print("Store Analytics")
-            product_count = db.query(Product).count()
-            all_products = db.query(Product).all()
-            
-            # Calculate total value using a loop
-            total_value = 0
-            for p in all_products:
-                total_value = total_value + (p.price * p.stock)
-            
-            print(f"Total Products: {product_count}")
-            print(f"Inventory Value: KSh {total_value}")
+            show_analytics(db)
 
         elif choice == '6':
             print("Goodbye!")
@@ -127,5 +206,104 @@ def main():
         
         input("\nPress Enter to continue...")
 
+# Non-interactive commands
+
+def reindex_search():
+    """Rebuild the product full-text search index from the products table."""
+    from search import rebuild_search_index
+
+    if engine.dialect.name != "sqlite":
+        print("Full-text search index is only used with SQLite. Nothing to do.")
+        return
+    with engine.begin() as connection:
+        rebuild_search_index(connection)
+    print("Search index rebuilt.")
+
+
+def import_catalog(kind, path, batch_size):
+    """Bulk-import categories or products from a CSV/JSON file."""
+    from catalog_import import import_file
+
+    db = get_db_session()
+    try:
+        imported, rejected, seconds = import_file(db, kind, path, batch_size)
+    finally:
+        db.close()
+
+    rate = imported / seconds if seconds > 0 else imported
+    print(f"Imported {imported} {kind} in {seconds:.2f}s ({rate:,.0f} rows/sec)")
+    if rejected:
+        print(f"Rejected {len(rejected)} rows:")
+        for line_number, reason in rejected:
+            print(f"  line {line_number}: {reason}")
+
+
+def archive(days, statuses, batch_size, pause, dry_run):
+    """Move old orders in a terminal status to the archive tables."""
+    from archive import archive_cutoff, archive_orders, count_archivable
+
+    cutoff = archive_cutoff(days)
+    if dry_run:
+        with engine.connect() as connection:
+            count = count_archivable(connection, cutoff, statuses)
+        print(f"{count} orders ({', '.join(statuses)}) created before {cutoff:%Y-%m-%d %H:%M} would be archived")
+        return
+
+    started = time.perf_counter()
+    orders, items = archive_orders(engine, cutoff, statuses, batch_size, pause)
+    seconds = time.perf_counter() - started
+    print(f"Archived {orders} orders and {items} order items in {seconds:.2f}s")
+
+
+def run_command(args):
+    """Run a subcommand, e.g. `python cli.py reindex`."""
+    import argparse
+    from archive import (
+        ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_PAUSE_SECONDS, ARCHIVE_STATUSES
+    )
+
+    parser = argparse.ArgumentParser(prog="cli.py", description="Haze Online store manager")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("reindex", help="Rebuild the product search index")
+    importer = commands.add_parser("import", help="Bulk-import categories or products from CSV/JSON")
+    importer.add_argument("kind", choices=["categories", "products"])
+    importer.add_argument("path", help="A .csv, .ndjson/.jsonl or .json file")
+    importer.add_argument("--batch-size", type=int, default=5000, help="Rows per transaction")
+    analytics = commands.add_parser("analytics", help="Print store analytics reports")
+    analytics.add_argument("--low-stock", type=int, default=LOW_STOCK_THRESHOLD,
+                           help="Stock level at or below which a product is listed as low")
+
+    archiver = commands.add_parser("archive", help="Move old finished orders to the archive tables")
+    archiver.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS,
+                          help="Archive orders created more than this many days ago")
+    archiver.add_argument("--statuses", default=",".join(ARCHIVE_STATUSES),
+                          help="Comma-separated statuses that may be archived")
+    archiver.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE,
+                          help="Orders moved per transaction")
+    archiver.add_argument("--pause", type=float, default=ARCHIVE_PAUSE_SECONDS,
+                          help="Seconds to wait between batches")
+    archiver.add_argument("--dry-run", action="store_true", help="Only count what would be archived")
+
+    options = parser.parse_args(args)
+    if options.command == "reindex":
+        reindex_search()
+    elif options.command == "import":
+        import_catalog(options.kind, options.path, options.batch_size)
+    elif options.command == "analytics":
+        db = get_db_session()
+        try:
+            show_analytics(db, options.low_stock)
+        finally:
+            db.close()
+    elif options.command == "archive":
+        statuses = [status.strip() for status in options.statuses.split(",") if status.strip()]
+        archive(options.days, statuses, options.batch_size, options.pause, options.dry_run)
+
+
 if __name__ == "__main__":
-    main()
+    check_schema()
+    # With no arguments, start the interactive menu
+    if len(sys.argv) > 1:
+        run_command(sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,50 @@
+"""
+Helpers for conditional GET (ETag / Last-Modified) on catalog resources.
+"""
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+
+def make_etag(*parts):
+    """Build a strong ETag from the values that identify a representation."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def to_utc(value):
+    """Treat naive timestamps (stored with datetime.now) as local time."""
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def validator_headers(etag, last_modified):
+    """Response headers for the given validators."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(to_utc(last_modified), usegmt=True)
+    return headers
+
+
+def is_not_modified(request, etag, last_modified):
+    """
+    True if the client's cached copy is still current.
+
+    If-None-Match wins over If-Modified-Since when both are sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return to_utc(last_modified) <= since
+    return False
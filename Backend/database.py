@@ -1,28 +1,382 @@
 """
 Database configuration and session management.
+
+Settings are read from the environment:
+
+    DATABASE_URL            Database to use (default: sqlite:///./haze.db)
+    DATABASE_READ_URL       Read replica for GET routes (server databases; optional)
+    DB_READ_ROUTING         "on" (default) gives reads their own pool; "off" shares the write pool
+    DB_POOL_SIZE            Connections kept open per process (server databases)
+    DB_MAX_OVERFLOW         Extra connections allowed under load (server databases)
+    DB_POOL_TIMEOUT         Seconds to wait for a free connection
+    DB_POOL_RECYCLE         Seconds before a connection is replaced
+    SQLITE_BUSY_TIMEOUT_MS  How long SQLite waits on a lock before failing
+    SQLITE_MMAP_SIZE        Bytes of the SQLite file to memory-map
+    QUERY_BUDGET            Warn when one request runs more statements than this
+    QUERY_REPEAT_THRESHOLD  Warn when one statement shape repeats this often in a request
+    DB_SCHEMA_CHECK         "error" (default), "warn" or "off": what init_db() does when the
+                            database is not at the latest Alembic revision
+    DB_POOL_WARM            Connections init_db() opens per pool before serving (default: 2)
+
+Importing this module creates the engines but does not connect. The schema
+belongs to Alembic (`alembic upgrade head`); init_db(), run once per worker
+from the app's lifespan, only checks that the database is up to date.
 """
-from sqlalchemy import create_engine
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from models import Base
 
-# Database URL - using SQLite for development
-DATABASE_URL = "sqlite:///./haze.db"
+logger = logging.getLogger("haze.db")
+
+# Directory holding alembic.ini and migrations/
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Database URL - SQLite for development, override with DATABASE_URL in production
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./haze.db")
+
+# Read replica, if any; without one, reads use their own pool on DATABASE_URL
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or DATABASE_URL
+DB_READ_ROUTING = os.getenv("DB_READ_ROUTING", "on").lower() != "off"
+
+# Connection pool settings (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite tuning
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Startup checks
+DB_SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "error").lower()
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "2"))
+
+# Per-request query warnings (0 disables)
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "20"))
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+
+# Async drivers used by the API for each sync driver
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url):
+    """Swap the driver in a database URL for its async equivalent."""
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+", 1)[0]
+    return f"{ASYNC_DRIVERS.get(backend, scheme)}://{rest}"
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+
+def is_sqlite(url):
+    """True if the URL points at a SQLite database."""
+    return url.startswith("sqlite")
+
+
+def engine_options(url):
+    """Keyword arguments for create_engine()/create_async_engine() for this backend."""
+    if is_sqlite(url):
+        # check_same_thread=False is needed for SQLite to work with FastAPI
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,  # Drop dead connections before handing them out
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection.
+
+    WAL lets readers keep reading while a write is in progress, and
+    busy_timeout makes writers wait for the lock instead of failing
+    straight away with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def apply_read_only_pragmas(dbapi_connection, connection_record):
+    """Tune a SQLite connection like any other, then refuse writes on it."""
+    apply_sqlite_pragmas(dbapi_connection, connection_record)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+# QUERY INSTRUMENTATION
+
+class QueryStats:
+    """Statements run, total time and how often each statement shape ran."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold=QUERY_REPEAT_THRESHOLD):
+        """(shape, count) for statements run at least `threshold` times (likely N+1)."""
+        if threshold <= 0:
+            return []
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+# Stats for the request being handled, set by QueryTimingMiddleware
+current_query_stats = ContextVar("current_query_stats", default=None)
+
+# Extra collectors opened with count_queries(), e.g. by tests
+_collectors = []
+
+
+def statement_shape(statement):
+    """A statement with whitespace and IN (...) lists collapsed, for grouping."""
+    shape = re.sub(r"\s+", " ", statement).strip()
+    return re.sub(r"IN \((?:[^()]*)\)", "IN (...)", shape)
+
+
+@contextmanager
+def track_queries():
+    """Collect stats for statements run in the current context (one request)."""
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+@contextmanager
+def count_queries():
+    """
+    Collect stats for every statement run while the block is open, on any
+    thread or event loop. Meant for tests:
+
+        with count_queries() as queries:
+            client.get("/orders?expand=items")
+        assert queries.count <= 3
+    """
+    stats = QueryStats()
+    _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.remove(stats)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._query_started
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    for collector in _collectors:
+        collector.record(statement, seconds)
+
+
+def instrument(sync_engine):
+    """Count and time every statement run through `sync_engine`."""
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
 
 # Create database engine
-# check_same_thread=False is needed for SQLite to work with FastAPI
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+
+# Async engine used by the API route handlers
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(DATABASE_URL))
+
+if is_sqlite(DATABASE_URL):
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
+instrument(engine)
+instrument(async_engine.sync_engine)
+
+# Separate engine (and pool) for GET routes, so reads never queue behind
+# writes for a connection. On SQLite its connections are query_only; WAL
+# lets them read while a write transaction is open.
+if DB_READ_ROUTING:
+    read_engine = create_async_engine(
+        to_async_url(DATABASE_READ_URL), **engine_options(DATABASE_READ_URL)
+    )
+    if is_sqlite(DATABASE_READ_URL):
+        event.listen(read_engine.sync_engine, "connect", apply_read_only_pragmas)
+    instrument(read_engine.sync_engine)
+else:
+    read_engine = async_engine
 
 # Session factory for creating database sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+# Async session factory
+# expire_on_commit=False so objects can still be read after commit without
+# triggering a lazy (blocking) reload
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Session factory for read-only work (GET routes, exports)
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine, autoflush=False, expire_on_commit=False
+)
+
+# SCHEMA CHECK AND STARTUP
+
+def alembic_config(url=None):
+    """Alembic Config for this project, optionally pointed at another database."""
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    if url is not None:
+        config.set_main_option("sqlalchemy.url", url)
+    return config
+
+
+# `revision = '...'` and `down_revision = '...'` lines of a migration file
+REVISION_LINE = re.compile(r"^(revision|down_revision)\b[^=]*=\s*'(\w+)'", re.MULTILINE)
+
+
+def migration_heads():
+    """
+    Revisions no other migration builds on, read from migrations/versions.
+
+    Parsed directly rather than through Alembic's ScriptDirectory so that
+    startup doesn't pay for importing Alembic.
+    """
+    versions_dir = os.path.join(BACKEND_DIR, "migrations", "versions")
+    revisions, parents = set(), set()
+    for name in os.listdir(versions_dir):
+        if name.endswith(".py"):
+            with open(os.path.join(versions_dir, name)) as f:
+                fields = dict(REVISION_LINE.findall(f.read()))
+            revisions.add(fields["revision"])
+            parents.add(fields.get("down_revision"))
+    return revisions - parents
+
+
+def schema_problem(connection):
+    """
+    None if the database is at the latest Alembic revision, otherwise a
+    message saying what's wrong. Takes a sync Connection.
+    """
+    heads = migration_heads()
+    current = set()
+    if inspect(connection).has_table("alembic_version"):
+        current = set(connection.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    if current == heads:
+        return None
+    expected = ", ".join(sorted(heads))
+    if not current:
+        return f"Database has no schema version; run `alembic upgrade head` (expected {expected})"
+    return (f"Database is at revision {', '.join(sorted(current))} but the code expects "
+            f"{expected}; run `alembic upgrade head`")
+
+
+def report_schema_problem(problem):
+    """Raise or log a schema_problem() message, depending on DB_SCHEMA_CHECK."""
+    if problem is None:
+        return
+    if DB_SCHEMA_CHECK == "warn":
+        logger.warning(problem)
+    else:
+        raise RuntimeError(problem)
+
+
+def check_schema():
+    """Synchronous schema check for scripts such as cli.py."""
+    if DB_SCHEMA_CHECK == "off":
+        return
+    with engine.connect() as connection:
+        report_schema_problem(schema_problem(connection))
+
+
+def upgrade_schema(url=DATABASE_URL):
+    """Run `alembic upgrade head` on `url` (used by benchmarks and fresh setups)."""
+    from alembic import command
+
+    sync_engine = create_engine(url)
+    try:
+        with sync_engine.begin() as connection:
+            config = alembic_config(url)
+            config.attributes["connection"] = connection
+            command.upgrade(config, "head")
+    finally:
+        sync_engine.dispose()
+
+
+async def warm_pool(pool_engine, count):
+    """Open `count` connections at once and return them to the pool."""
+    connections = await asyncio.gather(*[pool_engine.connect() for _ in range(count)])
+    for connection in connections:
+        await connection.close()
+
+
+async def init_db():
+    """
+    Get this process ready to serve: check the schema and pre-open pooled
+    connections. Called from the app's lifespan, once per worker.
+    """
+    if DB_SCHEMA_CHECK != "off":
+        async with async_engine.connect() as connection:
+            report_schema_problem(await connection.run_sync(schema_problem))
+    if DB_POOL_WARM > 0:
+        await asyncio.gather(*[
+            warm_pool(pool_engine, DB_POOL_WARM) for pool_engine in {async_engine, read_engine}
+        ])
+
+
+async def close_db():
+    """Close every pooled connection (app shutdown)."""
+    for pool_engine in {async_engine, read_engine}:
+        await pool_engine.dispose()
+    engine.dispose()
+
+
+def reset_after_fork():
+    """
+    Drop pooled connections inherited from a parent process without closing
+    them (they belong to the parent). Call first thing in a forked worker.
+    """
+    engine.dispose(close=False)
+    for pool_engine in {async_engine, read_engine}:
+        pool_engine.sync_engine.dispose(close=False)
 
 
 def get_db():
     """
     Database session dependency for FastAPI.
-    
+
     Yields a database session and ensures it's closed after the request.
     Use this with FastAPI's Depends() in route functions.
     """
@@ -30,4 +384,25 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """
+    Async database session dependency for FastAPI.
+
+    Same as get_db() but yields an AsyncSession for `async def` routes.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    """
+    Read-only async database session dependency for GET routes.
+
+    Backed by the read engine: a replica or a separate pool, see
+    DATABASE_READ_URL and DB_READ_ROUTING. Use get_async_db() for writes.
+    """
+    async with ReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,87 @@
+"""
+Streaming exports of orders and order items as NDJSON or CSV.
+
+Rows are read with yield_per so only one batch is in memory at a time,
+and each batch is encoded and sent before the next one is fetched.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+from database import ReadSessionLocal
+from models import Order, OrderItem
+
+# Rows fetched from the database per batch
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def orders_statement(start=None, end=None):
+    """Select every order column, optionally limited to a created_at range."""
+    statement = select(*Order.__table__.columns)
+    if start is not None:
+        statement = statement.where(Order.created_at >= start)
+    if end is not None:
+        statement = statement.where(Order.created_at < end)
+    return statement.order_by(Order.id)
+
+
+def order_items_statement(start=None, end=None):
+    """Select every order item column, filtered on the parent order's created_at."""
+    statement = select(*OrderItem.__table__.columns)
+    if start is not None or end is not None:
+        statement = statement.join(Order, Order.id == OrderItem.order_id)
+    if start is not None:
+        statement = statement.where(Order.created_at >= start)
+    if end is not None:
+        statement = statement.where(Order.created_at < end)
+    return statement.order_by(OrderItem.id)
+
+
+def to_text(value):
+    """JSON/CSV-friendly form of a column value."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_ndjson(columns, rows):
+    return "".join(
+        json.dumps({column: to_text(value) for column, value in zip(columns, row)}) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([to_text(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def stream_rows(statement, export_format):
+    """
+    Yield the export one encoded batch at a time.
+
+    Uses its own session so the connection stays open for as long as the
+    response is streaming.
+    """
+    async with ReadSessionLocal() as db:
+        result = await db.stream(
+            statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        columns = list(result.keys())
+        if export_format == "csv":
+            yield encode_csv([columns])
+
+        async for batch in result.partitions():
+            if export_format == "csv":
+                yield encode_csv(batch)
+            else:
+                yield encode_ndjson(columns, batch)
@@ -0,0 +1,164 @@
+"""
+Idempotency-Key support for endpoints that create orders or take stock.
+
+A client sends the same `Idempotency-Key` header when it retries a request.
+The first request stores its response in the idempotency_keys table in the
+same transaction as the order it created; a retry with the same key gets
+that stored response back (with `Idempotent-Replayed: true`) and nothing is
+written or taken from stock again.
+
+Duplicates are serialized on the key: within a process by an asyncio lock,
+and across processes because the key row is inserted (and so locked) before
+any other work in the transaction. Failed requests are rolled back together
+with their key, so they can be retried.
+
+Settings are read from the environment:
+
+    IDEMPOTENCY_TTL_SECONDS             How long a key is remembered (default: 1 day)
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS  How often expired keys are deleted
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import IdempotencyKey
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = int(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "300"))
+
+
+class IdempotentReplay(Exception):
+    """Raised to answer a repeated request with its stored response."""
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+
+def fingerprint(endpoint, payload):
+    """Hash of the endpoint and request data, to spot a key reused for another request."""
+    data = json.dumps([endpoint, payload], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def expiry_cutoff():
+    """Keys created before this have expired."""
+    return datetime.now() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+
+
+async def purge_expired(db: AsyncSession):
+    """Delete expired keys; returns how many were removed. Doesn't commit."""
+    result = await db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.created_at < expiry_cutoff())
+    )
+    return result.rowcount
+
+
+_last_purge = 0.0
+
+
+async def purge_if_due(db: AsyncSession):
+    """Run purge_expired() at most once per purge interval in this process."""
+    global _last_purge
+    if time.monotonic() - _last_purge >= IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+        _last_purge = time.monotonic()
+        await purge_expired(db)
+
+
+# key -> [lock, number of requests using it]
+_key_locks = {}
+
+
+@asynccontextmanager
+async def key_lock(key):
+    """Let only one request per key run at a time in this process."""
+    entry = _key_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _key_locks[key]
+
+
+def replay(record, request_fingerprint):
+    """Raise the stored response for `record`, or 422 if the key was used for another request."""
+    if record.fingerprint != request_fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    raise IdempotentReplay(record.status_code, record.response_body)
+
+
+class IdempotentRequest:
+    """Handle returned by idempotent(); call commit() instead of db.commit()."""
+
+    def __init__(self, db: AsyncSession, record=None):
+        self.db = db
+        self.record = record
+
+    async def commit(self, body, status_code=200):
+        """Store `body` as the response for the key (if any) and commit."""
+        if self.record is not None:
+            self.record.status_code = status_code
+            self.record.response_body = json.dumps(body, separators=(",", ":"))
+            self.db.add(self.record)
+        await self.db.commit()
+
+
+@asynccontextmanager
+async def idempotent(db: AsyncSession, key, endpoint, payload):
+    """
+    Run a request body under an optional Idempotency-Key.
+
+        async with idempotent(db, idempotency_key, "POST /orders", data) as request:
+            ...  # do the work, flush instead of commit
+            await request.commit(body)
+
+    Raises IdempotentReplay if the key was already used for this request.
+    """
+    if not key:
+        yield IdempotentRequest(db)
+        return
+
+    request_fingerprint = fingerprint(endpoint, payload)
+    async with key_lock(key):
+        await purge_if_due(db)
+
+        record = await db.get(IdempotencyKey, key)
+        if record is not None and record.created_at < expiry_cutoff():
+            await db.delete(record)
+            await db.flush()
+            record = None
+        if record is not None:
+            replay(record, request_fingerprint)
+
+        # Claim the key first; a concurrent duplicate in another process
+        # blocks here (or fails on the primary key) until this one finishes
+        claimed = IdempotencyKey(
+            key=key, endpoint=endpoint, fingerprint=request_fingerprint,
+            status_code=0, response_body="", created_at=datetime.now(),
+        )
+        db.add(claimed)
+        try:
+            await db.flush()
+        except IntegrityError:
+            await db.rollback()
+            record = await db.get(IdempotencyKey, key)
+            if record is None:
+                raise
+            replay(record, request_fingerprint)
+
+        yield IdempotentRequest(db, claimed)
@@ -0,0 +1,106 @@
+"""
+Logging setup for the API.
+
+Settings are read from the environment:
+
+    LOG_LEVEL   DEBUG, INFO, WARNING, ... (default: INFO)
+    LOG_FORMAT  "text" for key=value lines or "json" for one JSON object per line
+
+Records are handed to a queue and written to stdout by a background thread,
+so logging never blocks a request on console I/O.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Attributes every LogRecord has; anything else came from `extra=`
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "taskName",
+}
+
+
+def extra_fields(record):
+    """The key/value pairs passed to a log call with extra={...}."""
+    return {
+        key: value for key, value in vars(record).items()
+        if key not in STANDARD_ATTRIBUTES
+    }
+
+
+class TextFormatter(logging.Formatter):
+    """`time level logger message key=value ...`"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = " ".join(f"{key}={value!r}" for key, value in extra_fields(record).items())
+        return f"{line} {fields}" if fields else line
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with extra fields as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **extra_fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_listener = None
+_queue_handler = None
+
+
+def start_listener(handler):
+    """Start a thread writing queued records to `handler`; returns the queue."""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    return log_queue
+
+
+def restart_after_fork():
+    """The listener thread doesn't survive fork(); give a child process its own."""
+    if _listener is not None:
+        _queue_handler.queue = start_listener(_listener.handlers[0])
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread."""
+    if _listener is not None:
+        _listener.stop()
+
+
+def setup_logging():
+    """Route the "haze" loggers through a background queue to stdout. Safe to call twice."""
+    global _queue_handler
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+    _queue_handler = logging.handlers.QueueHandler(start_listener(handler))
+    logger = logging.getLogger("haze")
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(_queue_handler)
+    logger.propagate = False
+
+    atexit.register(stop_logging)
+    os.register_at_fork(after_in_child=restart_after_fork)
@@ -0,0 +1,180 @@
+"""
+Request metrics in Prometheus text format.
+
+MetricsMiddleware records, per route template and method, a latency
+histogram and response counts by status code, plus the number of requests
+in flight. Metrics are per process; with several workers, scrape each one.
+
+QueryTimingMiddleware counts and times the SQL each request runs, reports
+it in a Server-Timing header and warns about query budgets and N+1 patterns.
+"""
+import bisect
+import logging
+import time
+from collections import defaultdict
+
+from database import QUERY_BUDGET, track_queries
+
+logger = logging.getLogger("haze.sql")
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """In-memory counters for HTTP requests."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # (method, route) -> [per-bucket counts (+Inf last), sum of seconds, count]
+        self.latency = {}
+        self.responses = defaultdict(int)  # (method, route, status) -> count
+        self.in_flight = 0
+
+    def observe(self, method, route, status, seconds):
+        series = self.latency.get((method, route))
+        if series is None:
+            series = self.latency[(method, route)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+        series[2] += 1
+        self.responses[(method, route, status)] += 1
+
+    def render(self):
+        """All metrics as Prometheus exposition text."""
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), (counts, total, count) in sorted(self.latency.items()):
+            labels = f'method="{method}",route="{route}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+        lines += [
+            "# HELP http_responses_total Responses by route and status code.",
+            "# TYPE http_responses_total counter",
+        ]
+        for (method, route, status), count in sorted(self.responses.items()):
+            lines.append(
+                f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}'
+            )
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being handled.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def render_counters(name, help_text, values):
+    """Prometheus text for a set of simple counters, e.g. cache hits/misses."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for label, value in values.items():
+        lines.append(f'{name}{{result="{label}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def render_value(name, help_text, kind, value):
+    """Prometheus text for a single unlabelled gauge or counter."""
+    return f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n{name} {value}\n"
+
+
+# Shared registry for the app
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that times every HTTP request.
+
+    Requests are labelled with the route template (e.g. /products/{product_id})
+    rather than the raw path, so ids don't create new series.
+    """
+
+    def __init__(self, app, metrics=request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # Reported if the app fails before responding
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.in_flight -= 1
+            route = scope.get("route")
+            self.metrics.observe(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+                time.perf_counter() - started,
+            )
+
+
+class QueryTimingMiddleware:
+    """
+    Pure ASGI middleware that tracks the SQL statements run by each request.
+
+    Adds `Server-Timing: db;dur=<ms>;desc="<n> queries"` to the response and
+    logs a warning when a request goes over QUERY_BUDGET statements or runs
+    the same statement shape QUERY_REPEAT_THRESHOLD times or more. Statements
+    run while a streaming body is sent come after the header and aren't in it.
+    """
+
+    def __init__(self, app, budget=QUERY_BUDGET):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    timing = f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"'
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", timing.encode("latin-1"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                self.report(scope, stats)
+
+    def report(self, scope, stats):
+        route = getattr(scope.get("route"), "path", scope["path"])
+        if self.budget > 0 and stats.count > self.budget:
+            logger.warning(
+                "Query budget exceeded",
+                extra={"method": scope["method"], "route": route,
+                       "queries": stats.count, "budget": self.budget,
+                       "db_ms": round(stats.seconds * 1000, 2)},
+            )
+        for shape, count in stats.repeated():
+            logger.warning(
+                "Repeated query, possible N+1",
+                extra={"method": scope["method"], "route": route,
+                       "times": count, "statement": shape},
+            )
@@ -1,3 +1,4 @@
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -9,9 +10,16 @@ from alembic import context
 # access to the values within the .ini file in use.
 config = context.config
 
+# Use the same database as the app when DATABASE_URL is set
+# (unless the caller already picked a database)
+if os.getenv("DATABASE_URL") and "connection" not in config.attributes:
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# Skipped when called from code (database.upgrade_schema) so the caller's
+# logging setup is left alone.
+if config.config_file_name is not None and "connection" not in config.attributes:
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -22,6 +30,11 @@ from models import Base
 target_metadata = Base.metadata 
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate away from the FTS5 search tables (see search.py)."""
+    return not (type_ == "table" and name.startswith("products_fts"))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -46,6 +59,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -59,6 +73,12 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # A connection passed in by database.upgrade_schema() is used as is
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations_on(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -66,12 +86,17 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+        run_migrations_on(connection)
+
 
-        with context.begin_transaction():
-            context.run_migrations()
+def run_migrations_on(connection) -> None:
+    context.configure(
+        connection=connection, target_metadata=target_metadata,
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
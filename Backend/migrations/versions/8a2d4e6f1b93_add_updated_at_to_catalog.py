@@ -0,0 +1,39 @@
+"""add updated_at to categories and products
+
+Revision ID: 8a2d4e6f1b93
+Revises: 3f1c9a7b2e40
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a2d4e6f1b93'
+down_revision: Union[str, None] = '3f1c9a7b2e40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('categories', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('products', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Backfill existing rows so every row has a validator
+    op.execute("UPDATE categories SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+    op.execute("UPDATE products SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+
+    op.create_index(op.f('ix_categories_updated_at'), 'categories', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_products_updated_at'), 'products', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_updated_at'), table_name='products')
+    op.drop_index(op.f('ix_categories_updated_at'), table_name='categories')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('updated_at')
+    with op.batch_alter_table('categories') as batch_op:
+        batch_op.drop_column('updated_at')
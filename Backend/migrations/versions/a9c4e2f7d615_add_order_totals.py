@@ -0,0 +1,48 @@
+"""add total_amount and item_count to orders
+
+Revision ID: a9c4e2f7d615
+Revises: f2b6d8a4c317
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c4e2f7d615'
+down_revision: Union[str, None] = 'f2b6d8a4c317'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('total_amount', sa.Float(), server_default='0', nullable=False))
+    op.add_column('orders', sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the existing items
+    op.execute("""
+        UPDATE orders SET
+            total_amount = COALESCE((
+                SELECT ROUND(CAST(SUM(COALESCE(quantity, 0) * price_at_purchase) AS NUMERIC), 2)
+                FROM order_items WHERE order_items.order_id = orders.id
+            ), 0),
+            item_count = (
+                SELECT COUNT(*) FROM order_items WHERE order_items.order_id = orders.id
+            )
+    """)
+
+    op.create_index('ix_orders_status_created_at', 'orders', ['status', 'created_at'], unique=False)
+    op.create_index('ix_orders_total_amount_id', 'orders', ['total_amount', 'id'], unique=False)
+    op.create_index('ix_orders_status_total_amount_id', 'orders', ['status', 'total_amount', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_status_total_amount_id', table_name='orders')
+    op.drop_index('ix_orders_total_amount_id', table_name='orders')
+    op.drop_index('ix_orders_status_created_at', table_name='orders')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('item_count')
+        batch_op.drop_column('total_amount')
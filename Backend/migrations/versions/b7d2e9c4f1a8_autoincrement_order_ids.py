@@ -0,0 +1,52 @@
+"""use AUTOINCREMENT ids for orders and order_items
+
+Without AUTOINCREMENT, SQLite gives a new row max(id) + 1, so once the
+newest order or item is deleted or archived its id is handed out again and
+collides with the archived copy. Other databases use sequences, which never
+go back, so this only rebuilds the SQLite tables.
+
+Revision ID: b7d2e9c4f1a8
+Revises: d3f8b1a6c529
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e9c4f1a8'
+down_revision: Union[str, None] = 'd3f8b1a6c529'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Live table -> archive table holding rows that used to be in it
+TABLES = {'orders': 'archived_orders', 'order_items': 'archived_order_items'}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table, archive in TABLES.items():
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        # Start after the highest id ever used, archived rows included
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{table}'")
+        op.execute(f"""
+            INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', MAX(
+                COALESCE((SELECT MAX(id) FROM {table}), 0),
+                COALESCE((SELECT MAX(id) FROM {archive}), 0)
+            )
+        """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': False}):
+            pass
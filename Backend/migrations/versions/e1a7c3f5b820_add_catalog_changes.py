@@ -0,0 +1,34 @@
+"""add catalog_changes table for the change feed
+
+Revision ID: e1a7c3f5b820
+Revises: b4f8a2c6d913
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7c3f5b820'
+down_revision: Union[str, None] = 'b4f8a2c6d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('catalog_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.Text(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.Text(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('catalog_changes')
@@ -0,0 +1,32 @@
+"""add image_url to products
+
+The column was added to the model without a migration, so databases built
+by create_all at startup already have it; those are left as they are.
+
+Revision ID: f2b6d8a4c317
+Revises: e1a7c3f5b820
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6d8a4c317'
+down_revision: Union[str, None] = 'e1a7c3f5b820'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('products')}
+    if 'image_url' not in columns:
+        op.add_column('products', sa.Column('image_url', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('image_url')
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, Text, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, Text, DateTime, Float, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, relationship
 
 # Base class for all models
@@ -15,6 +15,7 @@ class Category(Base):
     name = Column(Text, nullable=False, unique=True)   # Category name (e.g. "Anime Apparel")
     description = Column(Text)                         # Optional description of the category
     created_at = Column(DateTime, default=datetime.now) # Timestamp when category was created
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True) # Timestamp of the last change
 
     # Relationship: One category can have many products
     products = relationship("Product", back_populates="category")
@@ -33,14 +34,20 @@ class Product(Base):
     stock = Column(Integer, default=0)                 # Available stock count
     image_url = Column(Text)                          
     created_at = Column(DateTime, default=datetime.now) # Timestamp when product was created
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True) # Timestamp of the last change
 
     # Foreign key: Product belongs to a category
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True)
 
     # Relationships
     category = relationship("Category", back_populates="products") # Link back to category
     order_items = relationship("OrderItem", back_populates="product") # Link to order items
 
+    # Category listings filter on category_id and sort/filter on price
+    __table_args__ = (
+        Index("ix_products_category_id_price", "category_id", "price"),
+    )
+
 
 
 # ORDER MODEL
@@ -50,25 +57,102 @@ class Order(Base):
 
     id = Column(Integer, primary_key=True)
     customer_name = Column(Text, nullable=False)       # Name of the customer placing the order
-    created_at = Column(DateTime, default=datetime.now) # Timestamp when order was created
-    status = Column(Text, default="pending")           # Order status (pending, shipped, etc.)
+    created_at = Column(DateTime, default=datetime.now, index=True) # Timestamp when order was created
+    status = Column(Text, default="pending", index=True) # Order status (pending, shipped, etc.)
+    # Kept up to date whenever items are added, so lists don't need order_items
+    total_amount = Column(Float, nullable=False, default=0, server_default="0") # Sum of quantity * price_at_purchase
+    item_count = Column(Integer, nullable=False, default=0, server_default="0") # Number of order_items rows
 
     # Relationship: One order can have many order items
     order_items = relationship("OrderItem", back_populates="order")
 
+    # GET /orders filters on status and created_at and sorts by total or id.
+    # AUTOINCREMENT so ids of deleted or archived orders are never reused.
+    __table_args__ = (
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        Index("ix_orders_total_amount_id", "total_amount", "id"),
+        Index("ix_orders_status_total_amount_id", "status", "total_amount", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
 
 
 # ORDER ITEM MODEL
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    # AUTOINCREMENT so ids of deleted or archived items are never reused
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)   # Link to order
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False) # Link to product
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)     # Link to order
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True) # Link to product
     quantity = Column(Integer, default=1)              # How many of this product were bought
     price_at_purchase = Column(Float, nullable=False)  # Product price at time of purchase
 
     # Relationships back to Order and Product
     order = relationship("Order", back_populates="order_items")   # Link back to order
     product = relationship("Product", back_populates="order_items") # Link back to product
+
+
+
+# ARCHIVED ORDER MODELS
+# Old, finished orders moved out of orders/order_items by archive.py.
+# Same columns as Order and OrderItem (keep them in step) plus archived_at.
+
+class ArchivedOrder(Base):
+    __tablename__ = "archived_orders"
+
+    id = Column(Integer, primary_key=True, autoincrement=False) # Id the order had while live
+    customer_name = Column(Text, nullable=False)
+    created_at = Column(DateTime)
+    status = Column(Text)
+    total_amount = Column(Float, nullable=False)
+    item_count = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, nullable=False)     # When it was moved to the archive
+
+    order_items = relationship("ArchivedOrderItem", back_populates="order")
+
+
+class ArchivedOrderItem(Base):
+    __tablename__ = "archived_order_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    order_id = Column(Integer, ForeignKey("archived_orders.id"), nullable=False, index=True)
+    product_id = Column(Integer, nullable=False)       # No foreign key, so archived items don't keep products from being deleted
+    quantity = Column(Integer)
+    price_at_purchase = Column(Float, nullable=False)
+
+    order = relationship("ArchivedOrder", back_populates="order_items")
+    product = relationship(
+        "Product", primaryjoin="foreign(ArchivedOrderItem.product_id) == Product.id", viewonly=True
+    )
+
+
+
+# IDEMPOTENCY KEY MODEL
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(Text, primary_key=True)                 # Client-supplied Idempotency-Key header
+    endpoint = Column(Text, nullable=False)              # e.g. "POST /orders"
+    fingerprint = Column(Text, nullable=False)           # Hash of endpoint + request body
+    status_code = Column(Integer, nullable=False)        # Status of the stored response
+    response_body = Column(Text, nullable=False)         # JSON body returned the first time
+    created_at = Column(DateTime, default=datetime.now, nullable=False, index=True) # Used for TTL cleanup
+
+
+
+# CATALOG CHANGE MODEL
+
+class CatalogChange(Base):
+    __tablename__ = "catalog_changes"
+    # AUTOINCREMENT so ids are never reused, even after old rows are deleted
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)              # Feed cursor, always increasing
+    entity = Column(Text, nullable=False)               # "category" or "product"
+    entity_id = Column(Integer, nullable=False)         # Id of the changed row
+    action = Column(Text, nullable=False)               # "created", "updated" or "deleted"
+    changed_at = Column(DateTime, default=datetime.now, nullable=False)
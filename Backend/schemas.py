@@ -0,0 +1,136 @@
+"""
+Pydantic schemas for JSON request bodies and responses.
+"""
+from datetime import datetime
+from typing import List, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+
+# CHECKOUT SCHEMAS
+
+class CheckoutLine(BaseModel):
+    product_id: int                 # Which product is being bought
+    quantity: int = Field(..., gt=0)  # How many (must be greater than zero)
+
+
+class CheckoutRequest(BaseModel):
+    customer_name: str = Field(..., min_length=1)  # Name of the customer placing the order
+    items: List[CheckoutLine] = Field(..., min_length=1)  # Every line in the cart
+
+
+# BULK PRODUCT SCHEMAS
+
+class BulkProductIn(BaseModel):
+    """One row of POST /products/bulk; an existing name is updated instead of created."""
+    name: str = Field(..., min_length=1)
+    price: float = Field(..., ge=0)
+    category_id: int
+    description: Optional[str] = None
+    stock: int = Field(0, ge=0)
+    image_url: Optional[str] = None
+
+
+class BulkProductPatch(BaseModel):
+    """One row of PATCH /products/bulk, keyed by id or name."""
+    id: Optional[int] = None               # Product to change...
+    name: Optional[str] = None             # ...or find it by name
+    stock: Optional[int] = Field(None, ge=0)  # New absolute stock level
+    stock_delta: Optional[int] = None      # Or a change to apply (e.g. -3, +50)
+    price: Optional[float] = Field(None, ge=0)
+    description: Optional[str] = None
+    image_url: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_key_and_stock_mode(self):
+        if (self.id is None) == (self.name is None):
+            raise ValueError("give exactly one of id or name")
+        if self.stock is not None and self.stock_delta is not None:
+            raise ValueError("give stock or stock_delta, not both")
+        changes = (self.stock, self.stock_delta, self.price, self.description, self.image_url)
+        if all(value is None for value in changes):
+            raise ValueError("no fields to update")
+        return self
+
+
+class BulkRowResult(BaseModel):
+    index: int                    # Position of the row in the request
+    id: Optional[int] = None      # Product id, when known
+    name: Optional[str] = None
+    status: str                   # "created", "updated" or "error"
+    detail: Optional[str] = None  # Why the row failed
+
+
+class BulkResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[BulkRowResult]
+
+
+# RESPONSE SCHEMAS
+# from_attributes lets these be built straight from SQLAlchemy objects
+
+class CategoryOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class ProductOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    description: Optional[str] = None
+    price: float
+    stock: Optional[int] = None
+    image_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    category_id: int
+
+
+class OrderOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    customer_name: str
+    created_at: Optional[datetime] = None
+    status: Optional[str] = None
+    total_amount: Optional[float] = None  # Sum of the items' quantity * price_at_purchase
+    item_count: Optional[int] = None      # Number of items
+
+
+class OrderItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    order_id: int
+    product_id: int
+    quantity: Optional[int] = None
+    price_at_purchase: float
+
+
+class OrderItemDetail(OrderItemOut):
+    line_total: float                     # quantity * price_at_purchase
+    product: Optional[ProductOut] = None  # Only with expand=items.product
+
+
+class OrderDetail(OrderOut):
+    items: Optional[List[OrderItemDetail]] = None  # Only with expand=items
+    total: Optional[float] = None                  # Sum of line totals
+    archived_at: Optional[datetime] = None         # Only for archived orders
+
+
+class ChangeOut(BaseModel):
+    seq: int                      # Position in the change feed; pass as ?since=
+    entity: str                   # "category" or "product"
+    id: int                       # Id of the changed row
+    action: str                   # "created", "updated" or "deleted"
+    changed_at: datetime
+    data: Optional[Union[ProductOut, CategoryOut]] = None  # Current row, null once deleted
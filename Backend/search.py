@@ -0,0 +1,71 @@
+"""
+Full-text product search backed by a SQLite FTS5 index.
+
+products_fts is an external-content FTS5 table over products.name and
+products.description. Triggers keep it in sync with inserts, deletes and
+updates of those two columns, so stock and price changes don't touch it.
+Both are created by the c7e5b1d9a204 migration.
+"""
+import re
+
+from sqlalchemy import select, text, or_
+
+from models import Product
+
+FTS_TABLE = "products_fts"
+
+# Weight matches in the name above matches in the description
+BM25_WEIGHTS = "10.0, 1.0"
+
+
+def rebuild_search_index(connection):
+    """Rebuild the whole index from the products table."""
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def to_match_query(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted so FTS operators typed by users can't cause syntax
+    errors, and the last word is a prefix match for search-as-you-type.
+    Returns None if there are no searchable words.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_statement(dialect_name, query, limit, offset):
+    """
+    Statement selecting Product rows matching `query`, best match first.
+
+    Returns None if the query has no searchable words. On databases
+    without FTS5 it falls back to a (slow) LIKE scan ordered by id.
+    """
+    if dialect_name != "sqlite":
+        pattern = f"%{query.strip()}%"
+        return (
+            select(Product)
+            .where(or_(Product.name.ilike(pattern), Product.description.ilike(pattern)))
+            .order_by(Product.id)
+            .limit(limit)
+            .offset(offset)
+        )
+
+    match = to_match_query(query)
+    if match is None:
+        return None
+    statement = text(
+        f"""
+        SELECT products.* FROM {FTS_TABLE}
+        JOIN products ON products.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH :match
+        ORDER BY bm25({FTS_TABLE}, {BM25_WEIGHTS})
+        LIMIT :limit OFFSET :offset
+        """
+    ).bindparams(match=match, limit=limit, offset=offset)
+    return select(Product).from_statement(statement)
@@ -0,0 +1,45 @@
+"""
+Fast JSON encoding for API responses.
+
+Rows are validated into the response schemas and dumped to JSON bytes by
+Pydantic's Rust core, which avoids FastAPI's reflective jsonable_encoder
+pass. Projected rows (plain dicts from ?fields=) have no schema and are
+dumped with orjson.
+"""
+from functools import lru_cache
+from typing import List
+
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def adapter_for(schema, many):
+    """A (cached) TypeAdapter for one `schema` or a list of them."""
+    return TypeAdapter(List[schema] if many else schema)
+
+
+def to_json(data, schema, projected=False, exclude_unset=False):
+    """
+    Encode a row or list of rows as JSON bytes.
+
+    `data` may hold ORM objects or dicts; both are read through `schema`.
+    Set `projected` for lists of plain column dicts that don't match the
+    schema, and `exclude_unset` to leave out optional keys never set.
+    """
+    if projected:
+        return orjson.dumps(data)
+    adapter = adapter_for(schema, isinstance(data, list))
+    value = adapter.validate_python(data, from_attributes=True)
+    return adapter.dump_json(value, exclude_unset=exclude_unset)
+
+
+def json_response(body: bytes, headers=None, status_code=200):
+    """Wrap already-encoded JSON bytes in a response."""
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
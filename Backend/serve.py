@@ -0,0 +1,114 @@
+"""
+Production entry point: import the app once, then fork the workers.
+
+The parent process imports app.py (FastAPI, SQLAlchemy, models, routes),
+checks the schema and binds the listening socket, then forks --workers
+copies of itself. Workers share the imported code copy-on-write instead of
+each importing it again, and each one opens its own connection pools in
+the app's lifespan (warmed with DB_POOL_WARM connections) before it takes
+requests. A worker that dies is replaced; SIGTERM or SIGINT stops them all.
+
+Usage:
+    python serve.py
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+--workers defaults to WEB_CONCURRENCY, or the number of CPUs.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import sys
+
+import uvicorn
+
+from app import app
+from database import check_schema, reset_after_fork
+from logging_config import stop_logging
+
+logger = logging.getLogger("haze.serve")
+
+# Exit status of a worker whose app failed to start (e.g. schema check)
+STARTUP_FAILURE = 3
+
+
+def run_worker(config, sock):
+    """Body of a forked worker process; never returns."""
+    status = 1
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        reset_after_fork()
+        server = uvicorn.Server(config)
+        server.run(sockets=[sock])
+        status = 0 if server.started else STARTUP_FAILURE
+    except BaseException:
+        logger.exception("Worker %s crashed", os.getpid())
+    finally:
+        stop_logging()
+        os._exit(status)
+
+
+def spawn(config, sock):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(config, sock)
+    logger.info("Started worker %s", pid)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with preforked workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    # Fail once here rather than in every worker
+    check_schema()
+
+    config = uvicorn.Config(app, host=args.host, port=args.port)
+    sock = config.bind_socket()
+
+    # Keep the objects created by the imports out of the workers' garbage
+    # collections, so collecting doesn't touch (and copy) the shared pages
+    gc.freeze()
+
+    workers = {spawn(config, sock) for _ in range(args.workers)}
+    stopping = False
+    exit_status = 0
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if code == STARTUP_FAILURE:
+            logger.error("Worker %s failed to start; shutting down", pid)
+            exit_status = STARTUP_FAILURE
+            stop(None, None)
+        else:
+            logger.warning("Worker %s exited (code %s); starting another", pid, code)
+            workers.add(spawn(config, sock))
+
+    sock.close()
+    sys.exit(exit_status)
+
+
+if __name__ == "__main__":
+    main()
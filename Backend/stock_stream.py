@@ -0,0 +1,150 @@
+"""
+Live stock and price updates over Server-Sent Events.
+
+Writers queue an update on their session with queue_stock_update(); when
+the session commits, the updates are published to every subscriber of this
+process (a rollback drops them). Each subscriber has a bounded queue: one
+that falls STREAM_QUEUE_SIZE events behind is disconnected with an
+"overflow" event, so a slow client can't make the server buffer without
+limit. It should reconnect and re-read the products it shows.
+
+Settings are read from the environment:
+
+    STREAM_QUEUE_SIZE          Events buffered per client before it is dropped
+    STREAM_MAX_SUBSCRIBERS     Open streams allowed per worker
+    STREAM_KEEPALIVE_SECONDS   Idle time before a keep-alive comment is sent
+
+Updates are per process: with several workers, a client only hears about
+writes handled by the worker it is connected to.
+"""
+import asyncio
+import json
+import os
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "10000"))
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+
+
+class Subscriber:
+    """One connected client: its filter and its bounded event queue."""
+
+    def __init__(self, product_ids, queue_size):
+        self.product_ids = product_ids  # None means every product
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+        self.active = True  # Counted in the broker until unsubscribed
+
+
+class StockBroker:
+    """In-process fan-out of stock updates to subscribers."""
+
+    def __init__(self, queue_size=STREAM_QUEUE_SIZE, max_subscribers=STREAM_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.everything = set()  # Subscribers without a filter
+        self.by_product = {}     # product_id -> set of subscribers
+        self.count = 0
+        self.dropped = 0         # Slow consumers disconnected so far
+
+    def subscribe(self, product_ids=None):
+        """Register a subscriber; returns None if the worker is at its limit."""
+        if self.count >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(product_ids, self.queue_size)
+        if product_ids is None:
+            self.everything.add(subscriber)
+        else:
+            for product_id in product_ids:
+                self.by_product.setdefault(product_id, set()).add(subscriber)
+        self.count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber; safe to call more than once."""
+        if not subscriber.active:
+            return
+        subscriber.active = False
+        self.count -= 1
+        if subscriber.product_ids is None:
+            self.everything.discard(subscriber)
+        else:
+            for product_id in subscriber.product_ids:
+                subscribers = self.by_product.get(product_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self.by_product[product_id]
+
+    def publish(self, update):
+        """Hand `update` (a dict with product_id) to every interested subscriber without waiting."""
+        targets = list(self.everything)
+        targets.extend(self.by_product.get(update["product_id"], ()))
+        for subscriber in targets:
+            try:
+                subscriber.queue.put_nowait(update)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {"subscribers": self.count, "dropped": self.dropped}
+
+
+# Shared broker for the app
+stock_broker = StockBroker()
+
+
+def queue_stock_update(db, product_id, stock, price, deleted=False):
+    """Publish a product's new stock and price once `db` commits."""
+    update = {
+        "product_id": product_id,
+        "stock": stock,
+        "price": float(price) if price is not None else None,
+    }
+    if deleted:
+        update["deleted"] = True
+    db.info.setdefault("stock_updates", []).append(update)
+
+
+@event.listens_for(Session, "after_commit")
+def publish_after_commit(session):
+    for update in session.info.pop("stock_updates", ()):
+        stock_broker.publish(update)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_after_rollback(session):
+    session.info.pop("stock_updates", None)
+
+
+def format_event(name, data):
+    """One SSE message."""
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stream_events(subscriber, snapshot=()):
+    """
+    Yield SSE messages for `subscriber` until the client goes away or falls
+    too far behind. `snapshot` is sent first (current values on connect).
+    """
+    try:
+        for update in snapshot:
+            yield format_event("stock", update)
+        while True:
+            try:
+                update = await asyncio.wait_for(subscriber.queue.get(), STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if subscriber.overflowed:
+                # Buffered events are stale once some were lost
+                yield format_event("overflow", {"detail": "client too slow; reconnect and resync"})
+                break
+            yield format_event("stock", update)
+    finally:
+        stock_broker.unsubscribe(subscriber)
@@ -0,0 +1,62 @@
+"""
+Shared test setup.
+
+The app reads its settings when it is imported, so the environment is set
+here, before any test module imports it. Each test session gets a fresh
+SQLite database in a temporary directory, migrated to the latest revision.
+Tests share that database, so they create their own categories and
+products with unique names instead of assuming it is empty.
+"""
+import itertools
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="haze-tests-")
+DATABASE_PATH = os.path.join(TEST_DIR, "haze.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+os.environ["LOG_LEVEL"] = "INFO"  # So log calls with extra= fields actually run
+os.environ["DB_READ_ROUTING"] = "on"  # The default; test_read_isolation relies on it
+
+import httpx
+import pytest
+
+from database import upgrade_schema
+
+upgrade_schema()
+
+from app import app
+
+_names = itertools.count(1)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    """An HTTP client talking to the app in-process, with its lifespan running."""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            yield client
+
+
+def unique_name(prefix):
+    return f"{prefix}-{next(_names)}"
+
+
+@pytest.fixture
+def make_product(client):
+    """Create a product (in a new category) and return its id."""
+    async def make(stock=10, price=10.0):
+        res = await client.post("/categories", data={"name": unique_name("category")})
+        res.raise_for_status()
+        res = await client.post("/products", data={
+            "name": unique_name("product"), "price": price,
+            "category_id": res.json()["category_id"], "stock": stock,
+        })
+        res.raise_for_status()
+        return res.json()["product_id"]
+    return make
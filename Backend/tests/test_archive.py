@@ -0,0 +1,73 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from archive import archive_orders
+from conftest import DATABASE_PATH, unique_name
+from database import engine
+
+pytestmark = pytest.mark.anyio
+
+
+def finish_and_age(order_id, status):
+    """Mark an order finished and a year old, straight in the database."""
+    with sqlite3.connect(DATABASE_PATH) as db:
+        db.execute("UPDATE orders SET status = ?, created_at = ? WHERE id = ?",
+                   (status, datetime.now() - timedelta(days=400), order_id))
+
+
+def archive(status):
+    return archive_orders(engine, datetime.now() - timedelta(days=365), [status], pause=0)
+
+
+async def create_order(client):
+    res = await client.post("/orders", data={"customer_name": unique_name("customer")})
+    return res.json()["order_id"]
+
+
+async def add_item(client, order_id, product_id):
+    res = await client.post("/order_items", data={
+        "order_id": order_id, "product_id": product_id, "quantity": 1,
+    })
+    assert res.status_code == 200
+    return res.json()["order_item_id"]
+
+
+async def test_archived_order_is_still_readable(client, make_product):
+    status = unique_name("delivered")
+    product_id = await make_product(stock=5, price=4.0)
+    order_id = await create_order(client)
+    await add_item(client, order_id, product_id)
+    finish_and_age(order_id, status)
+
+    assert archive(status) == (1, 1)
+
+    res = await client.get(f"/orders/{order_id}?expand=items")
+    assert res.status_code == 200
+    assert res.json()["archived_at"] is not None
+    assert res.json()["total"] == 4.0
+    assert (await client.patch(f"/orders/{order_id}", data={"status": "x"})).status_code == 404
+
+
+async def test_archived_ids_are_not_reused(client, make_product):
+    status = unique_name("delivered")
+    product_id = await make_product(stock=10)
+    first, second = await create_order(client), await create_order(client)
+    await add_item(client, second, product_id)
+    newest_item = await add_item(client, first, product_id)
+
+    # Archive the order holding the newest item
+    finish_and_age(first, status)
+    assert archive(status) == (1, 1)
+
+    # A new item must not take the archived item's id
+    third = await create_order(client)
+    assert await add_item(client, third, product_id) > newest_item
+    finish_and_age(third, status)
+    assert archive(status) == (1, 1)
+
+    # Same for orders, after the newest one is deleted
+    newest_order = await create_order(client)
+    assert (await client.delete(f"/orders/{newest_order}")).status_code == 200
+    assert await create_order(client) > newest_order
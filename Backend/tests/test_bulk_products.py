@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import event
+
+from conftest import unique_name
+from database import async_engine
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bulk_upsert_creates_updates_and_reports_errors(client):
+    res = await client.post("/categories", data={"name": unique_name("category")})
+    category_id = res.json()["category_id"]
+    existing, new = unique_name("product"), unique_name("product")
+    await client.post("/products", data={"name": existing, "price": 5, "category_id": category_id})
+
+    res = await client.post("/products/bulk", json=[
+        {"name": existing, "price": 7.5, "category_id": category_id, "stock": 3},
+        {"name": new, "price": 2, "category_id": category_id},
+        {"name": unique_name("product"), "price": 1, "category_id": 999_999},
+    ])
+
+    assert res.status_code == 200
+    body = res.json()
+    assert (body["created"], body["updated"], body["failed"]) == (1, 1, 1)
+    assert [row["status"] for row in body["results"]] == ["updated", "created", "error"]
+
+    product = (await client.get(f"/products/{body['results'][0]['id']}")).json()
+    assert (product["price"], product["stock"]) == (7.5, 3)
+
+
+async def test_bulk_patch_applies_stock_deltas(client, make_product):
+    product_id = await make_product(stock=10)
+
+    res = await client.patch("/products/bulk", json=[
+        {"id": product_id, "stock_delta": -4},
+        {"id": 999_999, "stock": 1},
+    ])
+
+    assert res.status_code == 200
+    assert (res.json()["updated"], res.json()["failed"]) == (1, 1)
+    assert (await client.get(f"/products/{product_id}")).json()["stock"] == 6
+
+
+async def test_bulk_patch_rejects_rows_without_changes(client, make_product):
+    product_id = await make_product()
+
+    res = await client.patch("/products/bulk", json=[{"id": product_id}])
+
+    assert res.status_code == 422
+    assert "no fields to update" in res.text
+
+
+async def test_bulk_patch_rolls_back_when_stock_guard_misses(client, make_product, monkeypatch):
+    first, second = await make_product(stock=5), await make_product(stock=5)
+
+    # A driver without reliable executemany rowcounts (like asyncpg)
+    monkeypatch.setattr(async_engine.dialect, "supports_sane_multi_rowcount", False)
+
+    sold_out = []
+
+    def checkout_meanwhile(conn, cursor, statement, parameters, context, executemany):
+        # Empty the second product's stock just before the guarded UPDATE,
+        # as a concurrent checkout would
+        if not sold_out and statement.startswith("UPDATE products") and ">=" in statement:
+            sold_out.append(second)
+            cursor.execute("UPDATE products SET stock = 0 WHERE id = ?", (second,))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", checkout_meanwhile)
+    try:
+        res = await client.patch("/products/bulk", json=[
+            {"id": first, "stock_delta": -1},
+            {"id": second, "stock_delta": -1},
+        ])
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", checkout_meanwhile)
+
+    assert res.status_code == 409
+    assert (await client.get(f"/products/{first}")).json()["stock"] == 5
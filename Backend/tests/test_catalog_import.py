@@ -0,0 +1,26 @@
+from sqlalchemy import select
+
+from catalog_import import import_file
+from conftest import unique_name
+from database import SessionLocal
+from models import Category
+
+
+def test_repeated_name_in_a_batch_is_rejected(tmp_path):
+    first, second = unique_name("category"), unique_name("category")
+    path = tmp_path / "categories.csv"
+    path.write_text(
+        "name,description\n"
+        f"{first},old\n"
+        f"{second},\n"
+        f"{first},new\n"
+        ",missing name\n"
+    )
+
+    with SessionLocal() as db:
+        imported, rejected, _ = import_file(db, "categories", str(path))
+        description = db.execute(select(Category.description).where(Category.name == first)).scalar()
+
+    assert imported == 2
+    assert rejected == [(2, "name repeated at line 4"), (5, "name is required")]
+    assert description == "new"
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import func, select
+
+import cli
+from conftest import unique_name
+from database import SessionLocal
+from models import CatalogChange, Category
+
+pytestmark = pytest.mark.anyio
+
+
+def run_menu(monkeypatch, answers):
+    """Run the interactive menu, answering its prompts in order (callables are called)."""
+    answers = iter(answers)
+
+    def answer(prompt=""):
+        if "Press Enter" in prompt:
+            return ""
+        value = next(answers)
+        return value() if callable(value) else value
+
+    monkeypatch.setattr("builtins.input", answer)
+    cli.main()
+
+
+async def test_menu_adds_show_up_in_change_feed(client, monkeypatch):
+    with SessionLocal() as db:
+        since = db.execute(select(func.coalesce(func.max(CatalogChange.id), 0))).scalar()
+    category_name, product_name = unique_name("category"), unique_name("product")
+
+    def category_id():
+        with SessionLocal() as db:
+            return str(db.execute(select(Category.id).where(Category.name == category_name)).scalar())
+
+    run_menu(monkeypatch, [
+        "4", category_name, "",
+        "3", product_name, "9.5", category_id, "3", "",
+        "6",
+    ])
+
+    changes = (await client.get("/changes", params={"since": since})).json()
+    assert [(change["entity"], change["action"], change["data"]["name"]) for change in changes] == [
+        ("category", "created", category_name),
+        ("product", "created", product_name),
+    ]
@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import unique_name
+
+pytestmark = pytest.mark.anyio
+
+# Later than any Last-Modified the tests can produce
+FUTURE = "Fri, 01 Jan 2100 00:00:00 GMT"
+
+
+async def test_list_is_fresh_after_delete(client):
+    res = await client.post("/categories", data={"name": unique_name("category")})
+    category_id = res.json()["category_id"]
+    product_ids = []
+    for _ in range(3):
+        res = await client.post("/products", data={
+            "name": unique_name("product"), "price": 1, "category_id": category_id, "stock": 1,
+        })
+        product_ids.append(res.json()["product_id"])
+    path = f"/categories/{category_id}/products"
+
+    res = await client.get(path)
+    etag = res.headers["ETag"]
+    assert "Last-Modified" not in res.headers
+    assert (await client.get(path, headers={"If-None-Match": etag})).status_code == 304
+
+    # Deleting the oldest product leaves max(updated_at) where it was
+    assert (await client.delete(f"/products/{product_ids[0]}")).status_code == 200
+
+    res = await client.get(path, headers={"If-Modified-Since": FUTURE})
+    assert res.status_code == 200
+    assert len(res.json()) == 2
+    res = await client.get(path, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+
+
+async def test_single_product_honors_if_modified_since(make_product, client):
+    product_id = await make_product()
+    res = await client.get(f"/products/{product_id}")
+    assert "Last-Modified" in res.headers
+    res = await client.get(f"/products/{product_id}", headers={"If-Modified-Since": FUTURE})
+    assert res.status_code == 304
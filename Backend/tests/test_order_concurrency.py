@@ -0,0 +1,56 @@
+import sqlite3
+
+import anyio
+import pytest
+
+from conftest import DATABASE_PATH, unique_name
+
+pytestmark = pytest.mark.anyio
+
+STOCK = 50
+BUYERS = 200
+
+
+def stock_and_items(product_id):
+    """(stock, order item count) for a product, read straight from the database."""
+    with sqlite3.connect(DATABASE_PATH) as db:
+        return db.execute(
+            "SELECT stock, (SELECT count(*) FROM order_items WHERE product_id = products.id)"
+            " FROM products WHERE id = ?", (product_id,)
+        ).fetchone()
+
+
+async def test_parallel_order_items_never_oversell(client, make_product):
+    product_id = await make_product(stock=STOCK)
+    order_ids = []
+    for _ in range(10):
+        res = await client.post("/orders", data={"customer_name": unique_name("customer")})
+        order_ids.append(res.json()["order_id"])
+
+    statuses = []
+    lowest_stock = STOCK
+    done = anyio.Event()
+
+    async def buy(i):
+        res = await client.post("/order_items", data={
+            "order_id": order_ids[i % len(order_ids)], "product_id": product_id, "quantity": 1,
+        })
+        statuses.append(res.status_code)
+
+    async def watch_stock():
+        nonlocal lowest_stock
+        while not done.is_set():
+            lowest_stock = min(lowest_stock, stock_and_items(product_id)[0])
+            await anyio.sleep(0.005)
+
+    async with anyio.create_task_group() as watcher:
+        watcher.start_soon(watch_stock)
+        async with anyio.create_task_group() as buyers:
+            for i in range(BUYERS):
+                buyers.start_soon(buy, i)
+        done.set()
+
+    assert statuses.count(200) == STOCK
+    assert statuses.count(400) == BUYERS - STOCK
+    assert stock_and_items(product_id) == (0, STOCK)
+    assert lowest_stock >= 0
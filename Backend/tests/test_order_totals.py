@@ -0,0 +1,75 @@
+import pytest
+
+from conftest import unique_name
+
+pytestmark = pytest.mark.anyio
+
+
+async def checkout(client, lines):
+    res = await client.post("/orders/checkout", json={
+        "customer_name": unique_name("customer"),
+        "items": [{"product_id": product_id, "quantity": quantity} for product_id, quantity in lines],
+    })
+    assert res.status_code == 200
+    return res.json()["order_id"]
+
+
+async def add_item(client, order_id, product_id, quantity):
+    res = await client.post("/order_items", data={
+        "order_id": order_id, "product_id": product_id, "quantity": quantity,
+    })
+    assert res.status_code == 200
+
+
+async def assert_totals_match_items(client, order_id):
+    order = (await client.get(f"/orders/{order_id}?expand=items")).json()
+    items = order["items"]
+    assert order["total_amount"] == round(
+        sum(item["quantity"] * item["price_at_purchase"] for item in items), 2
+    )
+    assert order["item_count"] == len(items)
+
+
+async def test_total_amount_follows_every_write_path(client, make_product):
+    cheap, dear = await make_product(price=2.5), await make_product(price=10.1)
+
+    res = await client.post("/orders", data={"customer_name": unique_name("customer")})
+    order_id = res.json()["order_id"]
+    await assert_totals_match_items(client, order_id)
+    await add_item(client, order_id, cheap, 2)
+    await assert_totals_match_items(client, order_id)
+    await add_item(client, order_id, dear, 3)
+    await assert_totals_match_items(client, order_id)
+
+    order_id = await checkout(client, [(cheap, 1), (dear, 2)])
+    await assert_totals_match_items(client, order_id)
+    await add_item(client, order_id, cheap, 3)
+    await assert_totals_match_items(client, order_id)
+
+
+@pytest.mark.parametrize("sort", ["-total", "total"])
+async def test_total_sort_pages_through_ties(client, make_product, sort):
+    five, three = await make_product(price=5, stock=100), await make_product(price=3, stock=100)
+    status = unique_name("tied")
+    totals = {}
+    for lines in ([(five, 1)], [(five, 1)], [(three, 1)], [(five, 1)], [(five, 1), (three, 1)],
+                  [(three, 1)], [(five, 1)]):
+        order_id = await checkout(client, lines)
+        await client.patch(f"/orders/{order_id}", data={"status": status})
+        totals[order_id] = sum(5 if product_id == five else 3 for product_id, _ in lines)
+
+    seen = []
+    after = None
+    while True:
+        params = {"sort": sort, "status": status, "limit": 2}
+        if after is not None:
+            params["after"] = after
+        res = await client.get("/orders", params=params)
+        seen += [order["id"] for order in res.json()]
+        after = res.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+
+    descending = sort.startswith("-")
+    expected = sorted(totals, key=lambda order_id: (totals[order_id], order_id), reverse=descending)
+    assert seen == expected
@@ -0,0 +1,39 @@
+import re
+
+import pytest
+
+from conftest import unique_name
+from database import count_queries
+
+pytestmark = pytest.mark.anyio
+
+
+async def checkout(client, product_ids):
+    res = await client.post("/orders/checkout", json={
+        "customer_name": unique_name("customer"),
+        "items": [{"product_id": product_id, "quantity": 1} for product_id in product_ids],
+    })
+    assert res.status_code == 200
+    return res.json()["order_id"]
+
+
+async def expanded_order_queries(client, order_id):
+    """Statements run by GET /orders/{id}?expand=items,items.product, counted two ways."""
+    with count_queries() as queries:
+        res = await client.get(f"/orders/{order_id}?expand=items,items.product")
+    assert res.status_code == 200
+    timing = re.search(r'desc="(\d+) queries"', res.headers["Server-Timing"])
+    return queries.count, int(timing.group(1)), len(res.json()["items"])
+
+
+async def test_expanded_order_runs_a_fixed_number_of_queries(client, make_product):
+    product_ids = [await make_product() for _ in range(20)]
+    small = await checkout(client, product_ids[:1])
+    large = await checkout(client, product_ids)
+
+    small_count, small_timing, small_items = await expanded_order_queries(client, small)
+    large_count, large_timing, large_items = await expanded_order_queries(client, large)
+
+    assert (small_items, large_items) == (1, 20)
+    # The order, its items, their products: no query per item
+    assert small_count == large_count == small_timing == large_timing == 3
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import sqlite
+
+from database import upgrade_schema
+from models import Order, OrderItem, Product
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    """A database of its own, migrated to the latest revision."""
+    path = tmp_path_factory.mktemp("query-plans") / "plans.db"
+    upgrade_schema(f"sqlite:///{path}")
+    with sqlite3.connect(path) as connection:
+        yield connection
+
+
+def query_plan(db, query):
+    sql = query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True})
+    return " | ".join(row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}"))
+
+
+@pytest.mark.parametrize("query, index", [
+    # GET /categories/{id}/products
+    (select(Product).where(Product.category_id == 1).order_by(Product.id).limit(50),
+     "ix_products_category_id"),
+    # A category's products by price (what ix_products_category_id_price is for)
+    (select(Product).where(Product.category_id == 1).order_by(Product.price, Product.id).limit(50),
+     "ix_products_category_id_price"),
+    # An order's items (GET /orders/{id}?expand=items, selectinload)
+    (select(OrderItem).where(OrderItem.order_id.in_([1, 2, 3])), "ix_order_items_order_id"),
+    # GET /orders?status=...
+    (select(Order).where(Order.status == "pending").order_by(Order.id).limit(50),
+     "ix_orders_status"),
+], ids=["category", "category-by-price", "order-items", "order-status"])
+def test_query_uses_index(db, query, index):
+    plan = query_plan(db, query)
+    assert f"USING INDEX {index} " in plan, plan
@@ -0,0 +1,60 @@
+"""
+Reads don't wait behind a long-running write (DB_READ_ROUTING=on).
+
+A write transaction is held from outside the app while enough checkouts to
+fill the write pool queue up behind it. GETs go through the read pool, so
+they must come back well before the lock is released.
+"""
+import sqlite3
+import time
+
+import anyio
+import pytest
+
+from conftest import DATABASE_PATH
+from database import DB_MAX_OVERFLOW, DB_POOL_SIZE, SQLITE_BUSY_TIMEOUT_MS
+
+pytestmark = pytest.mark.anyio
+
+HOLD_SECONDS = 2.0
+WRITERS = DB_POOL_SIZE + DB_MAX_OVERFLOW  # Every write connection stuck on the lock
+READERS = 10
+
+
+async def test_reads_finish_while_write_lock_is_held(client, make_product):
+    assert SQLITE_BUSY_TIMEOUT_MS > HOLD_SECONDS * 1000  # So the checkouts succeed afterwards
+    product_id = await make_product(stock=WRITERS)
+    checkouts = []
+    read_seconds = []
+
+    async def checkout():
+        res = await client.post("/orders/checkout", json={
+            "customer_name": "blocked", "items": [{"product_id": product_id, "quantity": 1}],
+        })
+        checkouts.append(res.status_code)
+
+    async def timed_read(path):
+        started = time.perf_counter()
+        res = await client.get(path)
+        read_seconds.append(time.perf_counter() - started)
+        assert res.status_code == 200
+
+    blocker = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+    try:
+        blocker.execute("BEGIN IMMEDIATE")
+        blocker.execute("UPDATE products SET stock = stock WHERE id = ?", (product_id,))
+        async with anyio.create_task_group() as tasks:
+            for _ in range(WRITERS):
+                tasks.start_soon(checkout)
+            await anyio.sleep(0.5)  # Let the checkouts take their connections
+
+            # /orders is never cached; the product detail isn't cached yet either
+            for i in range(READERS):
+                tasks.start_soon(timed_read, f"/products/{product_id}" if i % 2 else "/orders")
+            await anyio.sleep(HOLD_SECONDS)
+            blocker.execute("COMMIT")
+    finally:
+        blocker.close()
+
+    assert max(read_seconds) < HOLD_SECONDS / 4, read_seconds
+    assert checkouts.count(200) == WRITERS
@@ -0,0 +1,31 @@
+import pytest
+
+from stock_stream import StockBroker
+
+pytestmark = pytest.mark.anyio
+
+
+def test_unsubscribe_frees_the_slot_once():
+    broker = StockBroker(max_subscribers=2)
+    for product_ids in (None, {1, 2}, set()):
+        subscriber = broker.subscribe(product_ids)
+        broker.unsubscribe(subscriber)
+        broker.unsubscribe(subscriber)  # Second call is a no-op
+        assert broker.count == 0
+    assert broker.by_product == {} and broker.everything == set()
+
+
+def test_overflowed_subscriber_is_dropped():
+    broker = StockBroker(queue_size=1)
+    subscriber = broker.subscribe({1})
+    broker.publish({"product_id": 1, "stock": 5, "price": 1.0})
+    broker.publish({"product_id": 1, "stock": 4, "price": 1.0})
+    assert subscriber.overflowed and broker.count == 0 and broker.dropped == 1
+    broker.unsubscribe(subscriber)  # stream_events() still calls this on the way out
+    assert broker.count == 0
+
+
+@pytest.mark.parametrize("product_ids", [",", " , ", "1,x"])
+async def test_bad_product_ids_are_rejected(client, product_ids):
+    res = await client.get("/stream/stock", params={"product_ids": product_ids})
+    assert res.status_code == 400
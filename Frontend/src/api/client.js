@@ -16,6 +16,33 @@ export async function apiGet(endpoint) {
   }
 }
 
+/**
+ * GET every page of a paginated list endpoint.
+ * Follows the X-Next-Cursor header until the last page.
+ */
+export async function apiGetAll(endpoint) {
+  const items = [];
+  const separator = endpoint.includes("?") ? "&" : "?";
+  let cursor = null;
+  try {
+    do {
+      const url = cursor
+        ? `${API_BASE}${endpoint}${separator}after=${cursor}`
+        : `${API_BASE}${endpoint}`;
+      const response = await fetch(url);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      items.push(...(await response.json()));
+      cursor = response.headers.get("X-Next-Cursor");
+    } while (cursor);
+    return items;
+  } catch (error) {
+    console.error("API GET error:", error);
+    return items;
+  }
+}
+
 /**
  * Make a POST request with form data
  */
@@ -45,6 +72,30 @@ export async function apiPost(endpoint, data) {
   }
 }
 
+/**
+ * Make a POST request with a JSON body
+ */
+export async function apiPostJson(endpoint, data) {
+  try {
+    const response = await fetch(`${API_BASE}${endpoint}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(data),
+    });
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(
+        typeof error.detail === "string" ? error.detail : "Request failed"
+      );
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("API POST error:", error);
+    throw error;
+  }
+}
+
 /**
  * Make a PATCH request with form data
  */
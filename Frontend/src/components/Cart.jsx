@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import { apiPost, apiGet } from "../api/client.js";
+import { apiPostJson, apiGetAll } from "../api/client.js";
 // import { Card, CardHeader, CardTitle } from "./ui/card.jsx";
 // import { Button } from "./ui/button.jsx";
 // import { Input, Label } from "./ui/input.jsx";
@@ -23,7 +23,7 @@ function Cart() {
   // Fetch products to add to cart
   useEffect(() => {
     async function fetchProducts() {
-      const data = await apiGet("/products");
+      const data = await apiGetAll("/products");
       setProducts(data);
     }
     fetchProducts();
@@ -74,18 +74,14 @@ function Cart() {
 
     setLoading(true);
     try {
-      // Create order
-      const orderRes = await apiPost("/orders", { customer_name: customerName });
-      const orderId = orderRes.order_id;
-
-      // Add order items
-      for (const item of cartItems) {
-        await apiPost("/order_items", {
-          order_id: orderId,
+      // Create the order and all of its items in one request
+      await apiPostJson("/orders/checkout", {
+        customer_name: customerName,
+        items: cartItems.map((item) => ({
           product_id: item.id,
           quantity: item.quantity,
-        });
-      }
+        })),
+      });
 
       // Clear cart
       setCartItems([]);
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import { apiGet, apiDelete } from "../api/client.js";
+import { apiGetAll, apiDelete } from "../api/client.js";
 // import { Card } from "./ui/card.jsx";
 // import { Button } from "./ui/button.jsx";
 import { Grid, Trash2, AlertCircle } from "lucide-react";
@@ -10,7 +10,7 @@ function CategoryList() {
 
   async function fetchCategories() {
     setLoading(true);
-    const data = await apiGet("/categories");
+    const data = await apiGetAll("/categories");
     setCategories(data);
     setLoading(false);
   }
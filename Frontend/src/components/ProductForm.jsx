@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import { apiPost, apiGet } from "../api/client.js";
+import { apiPost, apiGetAll } from "../api/client.js";
 // import { Card, CardHeader, CardTitle } from "./ui/card.jsx";
 // import { Button } from "./ui/button.jsx";
 // import { Input, Label, Select } from "./ui/input.jsx";
@@ -20,7 +20,7 @@ function ProductForm({ onProductCreated }) {
 
   useEffect(() => {
     async function fetchCategories() {
-      const data = await apiGet("/categories");
+      const data = await apiGetAll("/categories");
       setCategories(data);
     }
     fetchCategories();
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import { apiGet, apiDelete } from "../api/client.js";
+import { apiGetAll, apiDelete } from "../api/client.js";
 // import { Card } from "./ui/card.jsx";
 // import { Button } from "./ui/button.jsx";
 import { Package, Trash2, ShoppingCart, AlertCircle } from "lucide-react";
@@ -11,7 +11,7 @@ function ProductList({ categoryId, onAddToCart }) {
   async function fetchProducts() {
     setLoading(true);
     const endpoint = categoryId ? `/categories/${categoryId}/products` : "/products";
-    const data = await apiGet(endpoint);
+    const data = await apiGetAll(endpoint);
     setProducts(data);
     setLoading(false);
   }
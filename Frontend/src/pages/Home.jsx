@@ -3,7 +3,7 @@ import { Link } from "react-router-dom";
 // Removed imports for separate components to keep it simple
 // import { Card } from "../components/ui/card.jsx";
 // import { Button } from "../components/ui/button.jsx";
-import { apiGet } from "../api/client.js";
+import { apiGetAll } from "../api/client.js";
 import { ShoppingBag, Grid, Package, ArrowRight, Sparkles } from "lucide-react";
 
 function Home() {
@@ -14,8 +14,8 @@ function Home() {
   useEffect(() => {
     async function fetchData() {
       const [products, cats] = await Promise.all([
-        apiGet("/products"),
-        apiGet("/categories"),
+        apiGetAll("/products"),
+        apiGetAll("/categories"),
       ]);
       setNewProducts(products.slice(-6));
       setCategories(cats);